@@ -0,0 +1,70 @@
+"""added blobs table
+
+Revision ID: 5e8d2b7c41a9
+Revises: 3c1f7a2e9b64
+Create Date: 2026-10-18 17:03:12.518204
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e8d2b7c41a9"
+down_revision: Union[str, None] = "3c1f7a2e9b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("key"),
+    )
+    # Existing rows keep their per-project objects and no blob
+    for table in ("documents", "logos"):
+        op.add_column(table, sa.Column("blob_id", sa.Uuid(), nullable=True))
+        op.create_foreign_key(None, table, "blobs", ["blob_id"], ["id"])
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for table in ("documents", "logos"):
+            # A failed concurrent build leaves an invalid index behind, which
+            # a rerun must rebuild rather than skip
+            op.drop_index(
+                f"ix_{table}_blob_id",
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+            op.create_index(
+                f"ix_{table}_blob_id",
+                table,
+                ["blob_id"],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in ("documents", "logos"):
+            op.drop_index(
+                f"ix_{table}_blob_id",
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    for table in ("documents", "logos"):
+        op.drop_constraint(f"{table}_blob_id_fkey", table, type_="foreignkey")
+        op.drop_column(table, "blob_id")
+    op.drop_table("blobs")
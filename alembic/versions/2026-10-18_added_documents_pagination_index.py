@@ -0,0 +1,46 @@
+"""added documents pagination index
+
+Revision ID: 9948d8118235
+Revises: f4541e89938b
+Create Date: 2026-10-18 10:12:31.406117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9948d8118235"
+down_revision: Union[str, None] = "f4541e89938b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an invalid index behind, which a
+        # rerun must rebuild rather than skip
+        op.drop_index(
+            "ix_documents_project_id_created_at_id",
+            table_name="documents",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.create_index(
+            "ix_documents_project_id_created_at_id",
+            "documents",
+            ["project_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_documents_project_id_created_at_id",
+            table_name="documents",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
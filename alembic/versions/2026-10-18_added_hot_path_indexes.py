@@ -0,0 +1,56 @@
+"""added hot path indexes
+
+Revision ID: 91d952b5afc0
+Revises: 9948d8118235
+Create Date: 2026-10-18 11:40:02.518734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "91d952b5afc0"
+down_revision: Union[str, None] = "9948d8118235"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# documents.project_id is already the leading column of
+# ix_documents_project_id_created_at_id, so it needs no index of its own.
+INDEXES = [
+    ("ix_m2m_projects_users_project_id", "m2m_projects_users", ["project_id"]),
+    ("ix_projects_owner_id", "projects", ["owner_id"]),
+    ("ix_projects_logo_id", "projects", ["logo_id"]),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # A failed concurrent build leaves an invalid index behind, which
+            # a rerun must rebuild rather than skip
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,56 @@
+"""added unique project membership index
+
+Revision ID: 3c1f7a2e9b64
+Revises: 91d952b5afc0
+Create Date: 2026-10-18 14:12:47.203915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1f7a2e9b64"
+down_revision: Union[str, None] = "91d952b5afc0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drop duplicate memberships first, the unique index can't be built over them
+    op.execute(
+        """
+        DELETE FROM m2m_projects_users a
+        USING m2m_projects_users b
+        WHERE a.user_id = b.user_id
+          AND a.project_id = b.project_id
+          AND (a.created_at, a.id) > (b.created_at, b.id)
+        """
+    )
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an invalid index behind, which a
+        # rerun must rebuild rather than skip
+        op.drop_index(
+            "ix_m2m_projects_users_user_id_project_id",
+            table_name="m2m_projects_users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.create_index(
+            "ix_m2m_projects_users_user_id_project_id",
+            "m2m_projects_users",
+            ["user_id", "project_id"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_m2m_projects_users_user_id_project_id",
+            table_name="m2m_projects_users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
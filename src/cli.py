@@ -0,0 +1,173 @@
+"""Bulk import and export of the database tables through PostgreSQL COPY.
+
+    python -m src.cli import users users.csv
+    python -m src.cli export documents documents.ndjson --format ndjson
+"""
+
+import argparse
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Sequence
+from uuid import uuid4
+
+import psycopg
+from psycopg import sql
+from sqlalchemy.engine import make_url
+
+from src.config import settings
+from src.documents import models as doc_models  # noqa: F401
+from src.logos import models as logo_models  # noqa: F401
+from src.models import Base
+from src.projects import models as proj_models  # noqa: F401
+from src.users import models as user_models  # noqa: F401
+from src.utils.auth import hash_password
+from src.utils.logger.main import logger, setup_logging
+
+TABLES = ["users", "blobs", "logos", "projects", "m2m_projects_users", "documents"]
+FORMATS = ["csv", "ndjson"]
+BATCH_SIZE = 10_000
+
+Row = dict[str, Any]
+
+
+def conninfo(url: str) -> str:
+    # psycopg takes a plain libpq URL, without the SQLAlchemy driver suffix
+    return make_url(url).set(drivername="postgresql").render_as_string(False)
+
+
+def detect_format(path: Path, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "ndjson" if path.suffix in (".ndjson", ".jsonl") else "csv"
+
+
+def read_rows(path: Path, fmt: str) -> Iterator[Row]:
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield {
+                    key: value if value != "" else None for key, value in row.items()
+                }
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(rows: Iterable[Row], size: int) -> Iterator[list[Row]]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def fill_defaults(batch: list[Row]) -> None:
+    # The model defaults are applied client-side, COPY bypasses them
+    now = datetime.now(timezone.utc)
+    for row in batch:
+        if not row.get("id"):
+            row["id"] = uuid4()
+        if not row.get("created_at"):
+            row["created_at"] = now
+        if not row.get("updated_at"):
+            row["updated_at"] = now
+
+
+def hash_passwords(batch: list[Row], executor: ProcessPoolExecutor) -> None:
+    pending = [row for row in batch if "password" in row]
+    hashes = executor.map(
+        hash_password, [row.pop("password") for row in pending], chunksize=64
+    )
+    for row, password_hash in zip(pending, hashes):
+        row["password_hash"] = password_hash
+
+
+def import_table(
+    conn: psycopg.Connection[Any],
+    table: str,
+    path: Path,
+    fmt: str,
+    workers: Optional[int],
+) -> int:
+    columns = list(Base.metadata.tables[table].columns.keys())
+    known = set(columns)
+    copy_stmt = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    total = 0
+    with ProcessPoolExecutor(workers) as executor, conn.cursor() as cur:
+        with cur.copy(copy_stmt) as copy:
+            for batch in batched(read_rows(path, fmt), BATCH_SIZE):
+                if table == "users":
+                    hash_passwords(batch, executor)
+                fill_defaults(batch)
+                for row in batch:
+                    unknown = row.keys() - known
+                    if unknown:
+                        raise ValueError(f"Unknown columns for {table}: {unknown}")
+                    copy.write_row([row.get(column) for column in columns])
+                total += len(batch)
+                logger.info("%s: %d rows loaded", table, total)
+    return total
+
+
+def export_table(
+    conn: psycopg.Connection[Any], table: str, path: Path, fmt: str
+) -> None:
+    if fmt == "csv":
+        copy_stmt = sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(
+            sql.Identifier(table)
+        )
+        with conn.cursor() as cur, cur.copy(copy_stmt) as copy, open(path, "wb") as f:
+            for data in copy:
+                f.write(data)
+        return
+
+    copy_stmt = sql.SQL(
+        "COPY (SELECT row_to_json(t)::text FROM {} t) TO STDOUT"
+    ).format(sql.Identifier(table))
+    with conn.cursor() as cur, cur.copy(copy_stmt) as copy, open(path, "w") as f:
+        copy.set_types(["text"])
+        for (line,) in copy.rows():
+            f.write(line + "\n")
+
+
+def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Bulk load a table from a file")
+    export_parser = commands.add_parser("export", help="Bulk dump a table to a file")
+    for command in (import_parser, export_parser):
+        command.add_argument("table", choices=TABLES)
+        command.add_argument("path", type=Path)
+        command.add_argument(
+            "--format", choices=FORMATS, help="Defaults to the file extension"
+        )
+    import_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes hashing plain `password` columns, defaults to the CPU count",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    fmt = detect_format(args.path, args.format)
+
+    with psycopg.connect(conninfo(settings.DATABASE_URL)) as conn:
+        if args.command == "import":
+            total = import_table(conn, args.table, args.path, fmt, args.workers)
+            logger.warning("Imported %d rows into %s", total, args.table)
+        else:
+            export_table(conn, args.table, args.path, fmt)
+            logger.warning("Exported %s to %s", args.table, args.path)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    main()
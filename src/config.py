@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,19 +10,64 @@ TYPES = {
     "image/jpeg": ".jpg",
 }
 
+MAX_SIZES = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+        50 * 1024 * 1024
+    ),
+    "application/pdf": 100 * 1024 * 1024,
+    "image/png": 10 * 1024 * 1024,
+    "image/jpeg": 10 * 1024 * 1024,
+}
+
 
 class Settings(BaseSettings):
     DATABASE_URL: str = ""
+    DATABASE_REPLICA_URL: str = ""
+    DB_REPLICA_LAG_WINDOW: float = 5
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = 5
+    DB_PGBOUNCER: bool = False
+    DB_QUERY_CACHE_SIZE: int = 500
     SECRET_KEY: str = ""
     ALGORITHM: str = ""
     TOKEN_EXPIRE_TIME: float = 0
+    TOKEN_CACHE_SIZE: int = 10_000
+    TOKEN_CACHE_TTL: float = 300
+    MEMBERSHIP_CACHE_SIZE: int = 100_000
+    MEMBERSHIP_CACHE_TTL: float = 300
+    DOC_LISTING_CACHE_SIZE: int = 2000
+    DOC_LISTING_CACHE_TTL: float = 60
     VALID_TYPES: dict[str, str] = TYPES
+    UPLOAD_MAX_SIZES: dict[str, int] = MAX_SIZES
+    IMAGE_MAX_PIXELS: int = 50_000_000
     DB_HOST: str = ""
     DB_PORT: int = 0
+    # "s3", or "local" to keep files on disk under LOCAL_STORAGE_PATH
+    STORAGE_BACKEND: Literal["s3", "local"] = "s3"
+    LOCAL_STORAGE_PATH: str = "bucket"
+    LOCAL_STORAGE_URL: str = "http://localhost:8000"
+    # Signs the local backend's URLs, derived from SECRET_KEY when unset
+    LOCAL_STORAGE_SECRET: str = ""
+    BLOB_SWEEP_INTERVAL: float = 300
+    BLOB_SWEEP_BATCH_SIZE: int = 1000
     AWS_BUCKET_NAME: str = ""
     AWS_DEFAULT_REGION: str = ""
     AWS_ACCESS_KEY_ID: str = ""
     AWS_SECRET_ACCESS_KEY: str = ""
+    AWS_ENDPOINT_URL: str = ""
+    AWS_DELETE_CONCURRENCY: int = 8
+    AWS_TRANSFER_CONCURRENCY: int = 16
+    AWS_UPLOAD_URL_EXPIRY: int = 900
+    AWS_UPLOAD_MAX_SIZE: int = 100 * 1024 * 1024
+    AWS_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    AWS_UPLOAD_CONCURRENCY: int = 4
+    AWS_PRESIGN_EXPIRY: int = 3600
+    AWS_PRESIGN_MARGIN: int = 300
+    AWS_PRESIGN_CACHE_SIZE: int = 10_000
 
     model_config = SettingsConfigDict(env_file=".env")
 
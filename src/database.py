@@ -1,17 +1,149 @@
-from typing import Generator
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Annotated, Any, AsyncGenerator, Optional, cast
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Depends, Request, Response
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
 
 from src.config import settings
+from src.utils.logger.main import logger
+from src.utils.metrics import metrics
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+checkout_wait = metrics.timer("db_pool_checkout_wait_seconds")
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            checkout_wait.observe(time.perf_counter() - start)
+
+
+def build_engine(url: str) -> AsyncEngine:
+    connect_args: dict[str, Any] = {}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer in transaction mode can hand each transaction a different
+        # server connection, so server-side prepared statements must be off.
+        connect_args["prepare_threshold"] = None
+
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args=connect_args,
+    )
+
+
+engine = build_engine(settings.DATABASE_URL)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+replica_engine: Optional[AsyncEngine] = None
+ReplicaSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = build_engine(settings.DATABASE_REPLICA_URL)
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, autoflush=False, expire_on_commit=False
+    )
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+# Same marker for clients without a cookie jar, which send it back themselves
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def current_pool() -> InstrumentedPool:
+    # dispose() swaps in a fresh pool, so always read it off the engine
+    return cast(InstrumentedPool, engine.pool)
+
+
+metrics.gauge("db_pool_checked_out", lambda: current_pool().checkedout())
+metrics.gauge("db_pool_checked_in", lambda: current_pool().checkedin())
+metrics.gauge("db_pool_overflow", lambda: current_pool().overflow())
+
+
+async def warm_up(db_engine: AsyncEngine, size: int) -> None:
     try:
+        async with AsyncExitStack() as stack:
+            await asyncio.gather(
+                *(stack.enter_async_context(db_engine.connect()) for _ in range(size))
+            )
+    except SQLAlchemyError as err:
+        logger.error("Connection pool warm-up failed: %s", err)
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def mark_read_primary(response: Response) -> None:
+    """Keep the client reading from the primary until the replica has caught
+    up with the write this response answers."""
+    if ReplicaSessionLocal is None:
+        return
+
+    until = str(time.time() + settings.DB_REPLICA_LAG_WINDOW)
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        until,
+        max_age=int(settings.DB_REPLICA_LAG_WINDOW) + 1,
+        httponly=True,
+        samesite="lax",
+    )
+    response.headers[READ_PRIMARY_HEADER] = until
+
+
+def _read_primary_until(request: Request) -> float:
+    until = 0.0
+    for value in (
+        request.cookies.get(READ_PRIMARY_COOKIE),
+        request.headers.get(READ_PRIMARY_HEADER),
+    ):
+        try:
+            until = max(until, float(value or 0))
+        except ValueError:
+            continue
+    return until
+
+
+async def get_read_db(
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only queries, served by the replica when one is set up.
+
+    Writing requests share the primary session, so everything they load can be
+    modified and committed, and they mark the client to keep reading from the
+    primary until the replica has caught up with the write.
+    """
+    if ReplicaSessionLocal is None:
+        yield db
+        return
+
+    if request.method not in SAFE_METHODS:
+        mark_read_primary(response)
+        yield db
+        return
+
+    if _read_primary_until(request) > time.time():
+        yield db
+        return
+
+    async with ReplicaSessionLocal() as replica_db:
+        yield replica_db
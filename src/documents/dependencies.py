@@ -1,23 +1,78 @@
+from dataclasses import dataclass
 from typing import Annotated
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_read_db
 from src.documents import models as doc_models
+from src.models import ProjectUser
+from src.projects import models as proj_models
+from src.users import models as user_models
+from src.users import schemas as user_schemas
+from src.users.dependencies import get_token_user_id, invalid_credentials
 from src.utils.logger.main import logger
 
-
-def get_doc_by_id(
-    doc_id: UUID, db: Annotated[Session, Depends(get_db)]
-) -> doc_models.Document:
-    document = (
-        db.query(doc_models.Document).filter(doc_models.Document.id == doc_id).first()
+# Resolves the caller, the document, its project's owner and the caller's
+# membership in that project in a single round-trip
+document_context = (
+    select(
+        user_models.User,
+        doc_models.Document,
+        proj_models.Project.owner_id,
+        ProjectUser.user_id.is_not(None).label("is_member"),
+    )
+    .select_from(user_models.User)
+    .outerjoin(doc_models.Document, doc_models.Document.id == bindparam("doc_id"))
+    .outerjoin(
+        proj_models.Project, proj_models.Project.id == doc_models.Document.project_id
+    )
+    .outerjoin(
+        ProjectUser,
+        and_(
+            ProjectUser.project_id == doc_models.Document.project_id,
+            ProjectUser.user_id == user_models.User.id,
+        ),
     )
-    if not document:
+    .where(user_models.User.id == bindparam("user_id"))
+)
+
+
+@dataclass
+class DocumentContext:
+    user: user_schemas.User
+    document: doc_models.Document
+    project_owner_id: UUID
+
+
+async def get_document_context(
+    doc_id: UUID,
+    user_id: Annotated[str, Depends(get_token_user_id)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> DocumentContext:
+    row = (
+        await db.execute(document_context, {"doc_id": doc_id, "user_id": user_id})
+    ).first()
+    if row is None:
+        logger.error(row)
+        raise invalid_credentials()
+
+    user, document, project_owner_id, is_member = row
+    if document is None:
         logger.error(document)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
-    return document
+    if not is_member:
+        logger.error(is_member)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden access"
+        )
+
+    return DocumentContext(
+        user=user_schemas.User.model_validate(user),
+        document=document,
+        project_owner_id=project_owner_id,
+    )
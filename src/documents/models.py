@@ -1,6 +1,6 @@
 from uuid import UUID
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.models import BaseDocument
@@ -8,6 +8,11 @@ from src.models import BaseDocument
 
 class Document(BaseDocument):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index(
+            "ix_documents_project_id_created_at_id", "project_id", "created_at", "id"
+        ),
+    )
     project_id: Mapped[UUID] = mapped_column(
         ForeignKey("projects.id", ondelete="CASCADE"), nullable=True
     )
@@ -1,83 +1,164 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, Query, UploadFile, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-from src.documents import models as doc_models
+from src.database import get_db, get_read_db
 from src.documents import schemas as doc_schemas
 from src.documents import service as doc_service
-from src.documents.dependencies import get_doc_by_id
-from src.files.dependencies import valid_file
-from src.projects import models as proj_models
+from src.documents.dependencies import DocumentContext, get_document_context
+from src.files import blobs, direct, download
+from src.files import schemas as file_schemas
+from src.files.storage import storage
+from src.files.streaming import FILE_UPLOAD_BODY, stream_upload
 from src.projects import schemas as proj_schemas
-from src.projects.dependencies import get_proj_by_id
-from src.users import schemas as user_schemas
-from src.users.dependencies import get_curr_user, is_participant
+from src.projects.dependencies import ProjectContext, get_project_context
+from src.utils.http import check_not_modified, make_etag
 from src.utils.logger.main import logger
+from src.utils.storage import url_window_start
 
 router = APIRouter()
 
 
-@router.post("/projects/{proj_id}/documents", status_code=status.HTTP_201_CREATED)
-def upload_document(
-    proj_model: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    document: Annotated[UploadFile, Depends(valid_file)],
-    user: Annotated[user_schemas.User, Depends(is_participant)],
-    db: Annotated[Session, Depends(get_db)],
+@router.post(
+    "/projects/{proj_id}/documents",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=FILE_UPLOAD_BODY,
+)
+async def upload_document(
+    request: Request,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> doc_schemas.Document:
+    # The access check is done: hand its connection back to the pool rather than
+    # pin it while the client sends the body. The insert takes a fresh one.
+    await db.close()
+    # Streamed straight to S3 as it arrives, large PDFs never touch the disk
+    document = await stream_upload(request, context.project.id)
     log_msg = "User: %s, Uploaded: %s to Project: %s"
-    logger.warning(log_msg, user.username, document, proj_model.name)
-    project = proj_schemas.Project.model_validate(proj_model)
-    return doc_service.create(document, project, user, db)
+    logger.warning(log_msg, context.user.username, document, context.project.name)
+    blob = await blobs.store_upload(
+        document.key,
+        document.sha256,
+        document.size,
+        document.content_type,
+        "documents",
+        db,
+    )
+    project = proj_schemas.Project.model_validate(context.project)
+    return await doc_service.add(document.filename, blob, project, context.user, db)
 
 
-@router.get(
-    "/projects/{proj_id}/documents",
-    dependencies=[Depends(is_participant)],
-    status_code=status.HTTP_200_OK,
+@router.post("/projects/{proj_id}/documents/upload-url", status_code=status.HTTP_200_OK)
+async def presign_document_upload(
+    upload: file_schemas.UploadRequest,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> file_schemas.PresignedUpload:
+    return await direct.presign_upload(upload, context.project.id, "documents", db)
+
+
+@router.post(
+    "/projects/{proj_id}/documents/finalize", status_code=status.HTTP_201_CREATED
 )
-def read_documents(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    db: Annotated[Session, Depends(get_db)],
+async def finalize_document_upload(
+    upload: file_schemas.UploadFinalize,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> doc_schemas.Document:
+    blob = await direct.finalize_upload(upload, context.project.id, "documents", db)
+    log_msg = "User: %s, Uploaded: %s to Project: %s"
+    logger.warning(log_msg, context.user.username, upload.name, context.project.name)
+    project = proj_schemas.Project.model_validate(context.project)
+    return await doc_service.add(upload.name, blob, project, context.user, db)
+
+
+@router.get("/projects/{proj_id}/documents", status_code=status.HTTP_200_OK)
+async def read_documents(
+    request: Request,
+    response: Response,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     limit: int = Query(5, ge=1, le=10, title="Limit"),
     offset: int = Query(0, ge=0, title="Offset"),
+    cursor: Optional[str] = Query(None, title="Cursor"),
+    include_count: bool = Query(True, title="Include count"),
 ) -> doc_schemas.PaginatedDocuments:
-    if not project.documents:
-        return doc_schemas.PaginatedDocuments(
-            documents=[], count=0, next=None, prev=None
-        )
-    return doc_service.read_all(project.id, limit, offset, db)
+    key = (context.project.id, limit, offset, cursor, include_count)
+    listing = doc_service.cached_listing(key)
+    if listing is not None:
+        check_not_modified(request, response, listing.etag, listing.last_modified)
+        return listing.page
+
+    last_modified, count = await doc_service.read_all_version(context.project.id, db)
+    # The page carries signed URLs, so it also changes with the URL window
+    window = url_window_start()
+    etag = make_etag(*key, last_modified, count, window.isoformat())
+    last_modified = max(last_modified, window) if last_modified else window
+    check_not_modified(request, response, etag, last_modified)
+    page = await doc_service.read_all(
+        context.project.id, limit, offset, cursor, include_count, db
+    )
+    doc_service.cache_listing(
+        key, doc_service.DocumentListing(etag, last_modified, page)
+    )
+    return page
 
 
 @router.get("/documents/{doc_id}", status_code=status.HTTP_200_OK)
-def download_document(
-    document: Annotated[doc_models.Document, Depends(get_doc_by_id)],
-    curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
+async def download_document(
+    request: Request,
+    response: Response,
+    context: Annotated[DocumentContext, Depends(get_document_context)],
 ) -> doc_schemas.Document:
-    is_participant(document.project_id, curr_user, db)
+    document = context.document
+    window = url_window_start()
+    etag = make_etag(document.id, document.updated_at.isoformat(), window.isoformat())
+    check_not_modified(request, response, etag, max(document.updated_at, window))
     return doc_service.read(document)
 
 
-@router.put("/documents/{doc_id}", status_code=status.HTTP_200_OK)
-def update_document(
-    document: Annotated[doc_models.Document, Depends(get_doc_by_id)],
-    file: Annotated[UploadFile, Depends(valid_file)],
-    curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
+@router.get("/documents/{doc_id}/content", status_code=status.HTTP_200_OK)
+async def download_document_content(
+    request: Request,
+    context: Annotated[DocumentContext, Depends(get_document_context)],
+) -> StreamingResponse:
+    document = context.document
+    return await download.stream_object(
+        request, storage.key_from_url(document.url), document.name
+    )
+
+
+@router.put(
+    "/documents/{doc_id}",
+    status_code=status.HTTP_200_OK,
+    openapi_extra=FILE_UPLOAD_BODY,
+)
+async def update_document(
+    request: Request,
+    context: Annotated[DocumentContext, Depends(get_document_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> doc_schemas.Document:
-    is_participant(document.project_id, curr_user, db)
+    document = context.document
+    # As for uploads, no connection is held while the body comes in
+    await db.close()
+    file = await stream_upload(request, document.project_id)
     log_msg = "Updated Document: %s to Document: %s"
     logger.warning(log_msg, document, file)
-    return doc_service.update(document, file, db)
+    # Detached by the close, attached again to save the change
+    db.add(document)
+    blob = await blobs.store_upload(
+        file.key, file.sha256, file.size, file.content_type, "documents", db
+    )
+    return await doc_service.update(document, file.filename, blob, db)
 
 
 @router.delete("/documents/{doc_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_document(
-    document: Annotated[doc_models.Document, Depends(get_doc_by_id)],
-    curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
+async def delete_document(
+    context: Annotated[DocumentContext, Depends(get_document_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> None:
-    project = get_proj_by_id(document.project_id, db)
-    doc_service.delete(document, curr_user.id, project.owner_id, db)
+    await doc_service.delete(
+        context.document, context.user.id, context.project_owner_id, db
+    )
@@ -10,6 +10,7 @@ class Document(file_schemas.FileBase):
     model_config = ConfigDict(from_attributes=True)
 
     url: str
+    download_url: Optional[str] = None
     id: UUID
     owner_id: UUID
     project_id: UUID
@@ -20,3 +21,4 @@ class PaginatedDocuments(BaseModel):
     count: Optional[int]
     next: Optional[int]
     prev: Optional[int]
+    next_cursor: Optional[str] = None
@@ -1,80 +1,203 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, UploadFile, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src import database
+from src.config import settings
 from src.documents import models as doc_models
 from src.documents import schemas as doc_schemas
+from src.files import blobs
+from src.files.models import Blob
+from src.files.storage import storage
 from src.projects import schemas as proj_schemas
 from src.users import schemas as user_schemas
-from src.utils.aws.s3 import S3Client
+from src.utils.cache import TTLCache
 from src.utils.logger.main import logger
+from src.utils.pagination import decode_cursor, encode_cursor
+from src.utils.storage import url_window_start
 
-s3 = S3Client()
+# (project id, limit, offset, cursor, include count)
+ListingKey = tuple[UUID, int, int, Optional[str], bool]
 
 
-def read_all(
-    proj_id: UUID, limit: int, offset: int, db: Session
+@dataclass
+class DocumentListing:
+    etag: str
+    last_modified: Optional[datetime]
+    page: doc_schemas.PaginatedDocuments
+
+
+listing_cache: TTLCache[ListingKey, DocumentListing] = TTLCache(
+    "document_listing", settings.DOC_LISTING_CACHE_SIZE
+)
+# Projects written to within the replica lag window. A replica may still serve
+# their old listings, so those aren't cached until the window has passed.
+recent_writes: TTLCache[UUID, bool] = TTLCache(
+    "document_listing_writes", settings.DOC_LISTING_CACHE_SIZE
+)
+
+
+def cached_listing(key: ListingKey) -> Optional[DocumentListing]:
+    return listing_cache.get(key)
+
+
+def cache_listing(key: ListingKey, listing: DocumentListing) -> None:
+    if recent_writes.get(key[0]) is None:
+        # Pages carry signed URLs, which must be refreshed with the window
+        window_end = url_window_start().timestamp() + settings.AWS_PRESIGN_MARGIN
+        expires_at = min(time.time() + settings.DOC_LISTING_CACHE_TTL, window_end)
+        listing_cache.set(key, listing, expires_at)
+
+
+def invalidate_listing(proj_id: UUID) -> None:
+    listing_cache.discard_where(lambda key, _: key[0] == proj_id)
+    if database.ReplicaSessionLocal is not None:
+        expires_at = time.time() + settings.DB_REPLICA_LAG_WINDOW
+        recent_writes.set(proj_id, True, expires_at)
+
+
+async def read_all(
+    proj_id: UUID,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    include_count: bool,
+    db: AsyncSession,
 ) -> doc_schemas.PaginatedDocuments:
-    count = db.query(func.count(doc_models.Document.id)).scalar()
-    doc_list = (
-        db.query(doc_models.Document)
-        .filter(doc_models.Document.project_id == proj_id)
-        .offset(offset)
-        .limit(limit)
-        .all()
+    stmt = (
+        select(doc_models.Document)
+        .where(doc_models.Document.project_id == proj_id)
+        .order_by(doc_models.Document.created_at, doc_models.Document.id)
+        .limit(limit + 1)
     )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(doc_models.Document.created_at, doc_models.Document.id)
+            > decode_cursor(cursor)
+        )
+    else:
+        stmt = stmt.offset(offset)
+    doc_list = (await db.scalars(stmt)).all()
+
+    has_more = len(doc_list) > limit
+    doc_list = doc_list[:limit]
+    count = None
+    if include_count:
+        count = await db.scalar(
+            select(func.count())
+            .select_from(doc_models.Document)
+            .where(doc_models.Document.project_id == proj_id)
+        )
+
     documents = [doc_schemas.Document.model_validate(doc) for doc in doc_list]
-    next_offset = offset + limit if offset + limit < count else None
-    prev_offset = max(0, offset - limit) if offset > 0 else None
+    download_urls = storage.presign_many(
+        [storage.key_from_url(doc.url) for doc in documents]
+    )
+    for doc in documents:
+        doc.download_url = download_urls[storage.key_from_url(doc.url)]
+    next_cursor = None
+    if has_more:
+        last = doc_list[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    next_offset = None
+    prev_offset = None
+    if not cursor:
+        next_offset = offset + limit if has_more else None
+        prev_offset = max(0, offset - limit) if offset > 0 else None
     return doc_schemas.PaginatedDocuments(
-        documents=documents, count=count, next=next_offset, prev=prev_offset
+        documents=documents,
+        count=count,
+        next=next_offset,
+        prev=prev_offset,
+        next_cursor=next_cursor,
     )
 
 
+async def read_all_version(
+    proj_id: UUID, db: AsyncSession
+) -> tuple[Optional[datetime], int]:
+    """Latest change and count of a project's documents, versioning its listing."""
+    row = (
+        await db.execute(
+            select(func.max(doc_models.Document.updated_at), func.count()).where(
+                doc_models.Document.project_id == proj_id
+            )
+        )
+    ).one()
+    return row[0], row[1]
+
+
 def read(document: doc_models.Document) -> doc_schemas.Document:
     doc = doc_schemas.Document.model_validate(document)
-    # Due to API Gateway problems we're only returning URL to the Document
-    # res = s3.download(f"{doc.project_id}_{doc.name}", "documents")
+    # Clients fetch the bytes straight from storage through the signed URL,
+    # or have the API stream them from the `/content` endpoint
+    doc.download_url = storage.presign(storage.key_from_url(doc.url))
     return doc
 
 
-def create(
+async def create(
     doc_file: UploadFile,
     project: proj_schemas.Project,
     user: user_schemas.User,
-    db: Session,
+    db: AsyncSession,
 ) -> doc_schemas.Document:
-    url = s3.upload(doc_file, project.id, "documents")
+    blob = await blobs.store_file(doc_file, "documents", db)
+    return await add(str(doc_file.filename), blob, project, user, db)
 
+
+async def add(
+    name: str,
+    blob: Blob,
+    project: proj_schemas.Project,
+    user: user_schemas.User,
+    db: AsyncSession,
+) -> doc_schemas.Document:
     document = doc_models.Document(
-        name=str(doc_file.filename), url=url, owner_id=user.id, project_id=project.id
+        name=name,
+        url=storage.object_url(blob.key),
+        blob_id=blob.id,
+        owner_id=user.id,
+        project_id=project.id,
     )
 
     db.add(document)
-    db.commit()
+    await db.commit()
+    invalidate_listing(project.id)
 
     return doc_schemas.Document.model_validate(document)
 
 
-def update(
-    document: doc_models.Document, file: UploadFile, db: Session
+async def update(
+    document: doc_models.Document, name: str, blob: Blob, db: AsyncSession
 ) -> doc_schemas.Document:
-    s3.delete(f"{document.project_id}_{document.name}", "documents")
-
-    document.name = str(file.filename)
-    document.url = s3.upload(file, document.project_id, "documents")
-    db.commit()
+    replaced = [(document.name, document.blob_id)]
+    keys = legacy_keys(document.project_id, replaced)
+
+    document.name = name
+    document.url = storage.object_url(blob.key)
+    document.blob_id = blob.id
+    await db.flush()
+    await blobs.release(blobs.blob_ids(replaced), db)
+    await db.commit()
+    # Only once committed: a failed commit leaves orphaned objects at worst,
+    # never rows pointing at deleted ones
+    await storage.delete_many(keys)
+    invalidate_listing(document.project_id)
 
     return doc_schemas.Document.model_validate(document)
 
 
-def delete(
+async def delete(
     document: doc_models.Document,
     curr_user_id: UUID,
     owner_id: UUID,
-    db: Session,
+    db: AsyncSession,
 ) -> None:
     if owner_id != curr_user_id:
         log_msg = "Current User: %s - IS NOT OWNER - Owner: %s"
@@ -84,6 +207,18 @@ def delete(
             detail="Only Project owner can delete Documents",
         )
 
-    s3.delete(f"{document.project_id}_{document.name}", "documents")
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.flush()
+    deleted = [(document.name, document.blob_id)]
+    keys = legacy_keys(document.project_id, deleted)
+    await blobs.release(blobs.blob_ids(deleted), db)
+    await db.commit()
+    await storage.delete_many(keys)
+    invalidate_listing(document.project_id)
+
+
+def legacy_keys(project_id: UUID, files: list[tuple[str, Optional[UUID]]]) -> list[str]:
+    """Objects of (name, blob id) files stored before content addressing."""
+    return [
+        f"documents/{project_id}_{name}" for name, blob_id in files if blob_id is None
+    ]
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+from collections import Counter
+from typing import IO, Iterable, Optional
+from uuid import UUID, uuid4
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Integer, Uuid, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import SessionLocal
+from src.files.models import Blob
+from src.files.storage import storage
+from src.utils.logger.main import logger
+from src.utils.storage import DERIVED_FOLDERS
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_key(folder: str, sha256: str) -> str:
+    return f"{folder}/{sha256}"
+
+
+def object_keys(key: str) -> list[str]:
+    folder, name = key.split("/", 1)
+    return [key] + [f"{derived}/{name}" for derived in DERIVED_FOLDERS.get(folder, [])]
+
+
+def upload_key(proj_id: UUID) -> str:
+    """Unique key for a file uploaded before its hash is known."""
+    return f"uploads/{proj_id}/{uuid4()}"
+
+
+def hash_file(fileobj: IO[bytes]) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := fileobj.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def blob_ids(files: Iterable[tuple[str, Optional[UUID]]]) -> list[UUID]:
+    """Blob ids of (name, blob id) file rows, skipping those stored before
+    content addressing."""
+    return [blob_id for _, blob_id in files if blob_id is not None]
+
+
+async def exists(key: str, db: AsyncSession) -> bool:
+    stmt = select(Blob.id).where(Blob.key == key, Blob.ref_count > 0)
+    return await db.scalar(stmt) is not None
+
+
+async def acquire(
+    folder: str, sha256: str, size: int, content_type: str, db: AsyncSession
+) -> Blob:
+    """Take a reference to a blob whose object was just written, creating its
+    row if there is none and reviving it if it is unreferenced.
+
+    The row stays locked until the caller commits, so `sweep` can't delete it
+    in the meantime.
+    """
+    stmt = (
+        insert(Blob)
+        .values(
+            key=blob_key(folder, sha256),
+            sha256=sha256,
+            size=size,
+            content_type=content_type,
+            ref_count=1,
+        )
+        .on_conflict_do_update(
+            index_elements=[Blob.key], set_={"ref_count": Blob.ref_count + 1}
+        )
+        .returning(Blob)
+    )
+    blob = await db.scalar(stmt, execution_options={"populate_existing": True})
+    assert blob is not None
+    return blob
+
+
+async def reference(key: str, db: AsyncSession) -> Optional[Blob]:
+    """Take a reference to a referenced blob, None if there is none.
+
+    Unreferenced blobs may be losing their object to `sweep`, the bytes must be
+    uploaded again to revive them.
+    """
+    stmt = (
+        update(Blob)
+        .where(Blob.key == key, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count + 1)
+        .returning(Blob)
+    )
+    blob: Optional[Blob] = await db.scalar(
+        stmt, execution_options={"populate_existing": True}
+    )
+    return blob
+
+
+async def release(blob_ids: list[UUID], db: AsyncSession) -> None:
+    """Drop one reference per id.
+
+    Blobs left unreferenced stay behind for `sweep` to delete, so an upload of
+    the same bytes meanwhile revives them rather than losing its object.
+    """
+    if not blob_ids:
+        return
+    counts = Counter(blob_ids)
+    refs = values(column("id", Uuid), column("n", Integer), name="refs").data(
+        list(counts.items())
+    )
+    await db.execute(
+        update(Blob)
+        .where(Blob.id == refs.c.id)
+        .values(ref_count=Blob.ref_count - refs.c.n)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def sweep(db: AsyncSession, limit: int) -> int:
+    """Delete up to `limit` unreferenced blobs and their objects, returning how
+    many were deleted.
+
+    The objects are removed before committing, while the rows are locked: an
+    upload of the same bytes waits in `acquire`, then finds the object gone
+    and writes it again. A failed commit leaves unreferenced rows without
+    their object, which `reference` never takes and uploads rewrite the same
+    way.
+    """
+    unreferenced = (
+        select(Blob.id)
+        .where(Blob.ref_count <= 0)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    keys = list(
+        await db.scalars(
+            delete(Blob)
+            .where(Blob.id.in_(unreferenced), Blob.ref_count <= 0)
+            .returning(Blob.key)
+        )
+    )
+    await storage.delete_many([obj for key in keys for obj in object_keys(key)])
+    await db.commit()
+    return len(keys)
+
+
+async def sweep_forever(interval: float, batch_size: int) -> None:
+    """Sweep every `interval` seconds, `batch_size` blobs per transaction."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                while await sweep(db, batch_size) == batch_size:
+                    pass
+        except Exception:
+            logger.exception("Blob sweep failed")
+
+
+async def swept(blob: Blob) -> bool:
+    """Whether a blob just acquired lost the object written for it to `sweep`.
+
+    Only a blob that was new or unreferenced can have; any sweep of it has
+    finished by the time `acquire` returns.
+    """
+    return blob.ref_count == 1 and await storage.head(blob.key) is None
+
+
+async def store_file(file: UploadFile, folder: str, db: AsyncSession) -> Blob:
+    """Store an uploaded file as the blob of its bytes."""
+    sha256, size = await run_in_threadpool(hash_file, file.file)
+    content_type = file.content_type or "application/octet-stream"
+    # Written before the row is locked, rather than holding the lock for the
+    # transfer. The key is the hash, so rewriting it changes nothing.
+    key = blob_key(folder, sha256)
+    await storage.put_file(file.file, key, content_type)
+    blob = await acquire(folder, sha256, size, content_type, db)
+    if await swept(blob):
+        await run_in_threadpool(file.file.seek, 0)
+        await storage.put_file(file.file, key, content_type)
+    return blob
+
+
+async def store_upload(
+    key: str,
+    sha256: str,
+    size: int,
+    content_type: str,
+    folder: str,
+    db: AsyncSession,
+) -> Blob:
+    """Move a file uploaded under `upload_key` to its blob."""
+    # Copied before the row is locked, as in `store_file`
+    await storage.copy(key, blob_key(folder, sha256))
+    blob = await acquire(folder, sha256, size, content_type, db)
+    if await swept(blob):
+        await storage.copy(key, blob.key)
+    await storage.delete(key)
+    return blob
@@ -1,19 +1,124 @@
-from fastapi import HTTPException, UploadFile, status
+from typing import Optional
+
+from fastapi import HTTPException, status
 
 from src.config import settings
 from src.utils.logger.main import logger
 
+MAGIC_NUMBERS = {
+    # A docx is a zip archive, its parts aren't looked into
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+        b"PK\x03\x04"
+    ),
+    "application/pdf": b"%PDF-",
+    "image/png": b"\x89PNG\r\n\x1a\n",
+    "image/jpeg": b"\xff\xd8\xff",
+}
+
+SNIFF_SIZE = 4 * 1024
+# A JPEG's dimensions come after its metadata segments, EXIF and ICC profiles
+IMAGE_HEADER_SIZE = 256 * 1024
+
+# JPEG start of frame markers, all but DHT, JPG and DAC
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD9)}
+
 
-def valid_file(file: UploadFile) -> UploadFile:
-    if not file.filename:
-        logger.error(file.filename)
+def check_file(filename: Optional[str], content_type: Optional[str]) -> None:
+    if not filename:
+        logger.error(filename)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file"
         )
-    if file.content_type not in settings.VALID_TYPES:
-        logger.error(file.content_type)
+    if content_type not in settings.VALID_TYPES:
+        logger.error(content_type)
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Unsupported file type",
         )
-    return file
+
+
+def max_size(content_type: str) -> int:
+    limit = settings.UPLOAD_MAX_SIZES.get(content_type, settings.AWS_UPLOAD_MAX_SIZE)
+    return min(limit, settings.AWS_UPLOAD_MAX_SIZE)
+
+
+def check_size(size: int, content_type: str) -> None:
+    if size > max_size(content_type):
+        logger.error(size)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large",
+        )
+
+
+def header_size(content_type: str) -> int:
+    """Leading bytes of a file `check_content` looks at."""
+    return IMAGE_HEADER_SIZE if content_type.startswith("image/") else SNIFF_SIZE
+
+
+def _png_size(header: bytes) -> Optional[tuple[int, int]]:
+    if header[12:16] != b"IHDR" or len(header) < 24:
+        return None
+    return int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+
+
+def _jpeg_size(header: bytes) -> Optional[tuple[int, int]]:
+    i = 2
+    while i + 4 <= len(header):
+        if header[i] != 0xFF:
+            return None
+        marker = header[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+        elif marker in JPEG_STANDALONE_MARKERS:
+            i += 2
+        elif marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(header):
+                return None
+            height = int.from_bytes(header[i + 5 : i + 7], "big")
+            width = int.from_bytes(header[i + 7 : i + 9], "big")
+            return width, height
+        else:
+            i += 2 + int.from_bytes(header[i + 2 : i + 4], "big")
+    return None
+
+
+def image_size(header: bytes, content_type: str) -> Optional[tuple[int, int]]:
+    """Width and height from an image's header, without decoding it."""
+    if content_type == "image/png":
+        return _png_size(header)
+    if content_type == "image/jpeg":
+        return _jpeg_size(header)
+    return None
+
+
+def check_content(header: bytes, content_type: str) -> None:
+    """Check a file's leading bytes match its declared type.
+
+    Images must also state their dimensions there, within IMAGE_MAX_PIXELS,
+    so a small file can't decompress into a huge bitmap.
+    """
+    if not header.startswith(MAGIC_NUMBERS.get(content_type, b"")):
+        logger.error(header[:16])
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="File content does not match its type",
+        )
+    if not content_type.startswith("image/"):
+        return
+
+    dimensions = image_size(header, content_type)
+    if dimensions is None or 0 in dimensions:
+        logger.error(dimensions)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid image"
+        )
+    width, height = dimensions
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        logger.error(dimensions)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Image dimensions too large",
+        )
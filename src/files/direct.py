@@ -0,0 +1,100 @@
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.files import blobs, schemas
+from src.files.dependencies import check_content, check_file, check_size, header_size
+from src.files.models import Blob
+from src.files.storage import storage
+from src.utils.logger.main import logger
+
+
+async def read_header(key: str, size: int, content_type: str) -> bytes:
+    length = min(size, header_size(content_type))
+    if not length:
+        return b""
+    return b"".join([chunk async for chunk in storage.stream(key, 0, length - 1)])
+
+
+async def presign_upload(
+    upload: schemas.UploadRequest, proj_id: UUID, folder: str, db: AsyncSession
+) -> schemas.PresignedUpload:
+    """Presigned POST the client sends the file to, bypassing the API.
+
+    Nothing is signed if a declared hash matches a stored blob. Otherwise the
+    hash is signed into the form, for the storage to verify the upload against.
+    """
+    check_file(upload.name, upload.content_type)
+    check_size(upload.size, upload.content_type)
+
+    if upload.sha256 is not None and await blobs.exists(
+        blobs.blob_key(folder, upload.sha256), db
+    ):
+        return schemas.PresignedUpload(url=None, fields=None, key=None, expires_in=None)
+
+    key = blobs.upload_key(proj_id)
+    post = storage.presign_post(key, upload.content_type, upload.size, upload.sha256)
+    return schemas.PresignedUpload(
+        url=post["url"],
+        fields=post["fields"],
+        key=key,
+        expires_in=settings.AWS_UPLOAD_URL_EXPIRY,
+    )
+
+
+async def finalize_upload(
+    upload: schemas.UploadFinalize, proj_id: UUID, folder: str, db: AsyncSession
+) -> Blob:
+    """Reference the blob a presigned upload, or a declared hash, stands for."""
+    key = upload.key
+    if key is not None and not key.startswith(f"uploads/{proj_id}/"):
+        logger.error(key)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+
+    if upload.sha256 is not None:
+        blob = await blobs.reference(blobs.blob_key(folder, upload.sha256), db)
+        if blob is not None:
+            check_file(upload.name, blob.content_type)
+            check_size(blob.size, blob.content_type)
+            if key is not None:
+                await storage.delete(key)
+            return blob
+
+    if key is None:
+        logger.error(key)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+    head = await storage.head(key)
+    if head is None:
+        logger.error(key)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found"
+        )
+
+    content_type = head.content_type or ""
+    try:
+        check_file(upload.name, content_type)
+        check_size(head.size, content_type)
+        check_content(await read_header(key, head.size, content_type), content_type)
+        # Verified by the storage if the upload was signed with its hash.
+        # Otherwise it is read back and hashed here, a hash declared by the
+        # client can't be trusted; the connection isn't held meanwhile.
+        sha256 = head.sha256
+        if sha256 is None:
+            await db.commit()
+            sha256 = await storage.sha256(key)
+        if upload.sha256 is not None and upload.sha256 != sha256:
+            logger.error(sha256)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Checksum mismatch",
+            )
+    except HTTPException:
+        await storage.delete(key)
+        raise
+    return await blobs.store_upload(key, sha256, head.size, content_type, folder, db)
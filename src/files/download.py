@@ -0,0 +1,95 @@
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from src.files.storage import storage
+from src.utils.http import check_not_modified, parse_http_date
+from src.utils.logger.main import logger
+from src.utils.storage import ObjectInfo
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """First and last byte of a `bytes=` range, None to send the whole file.
+
+    Multiple ranges and malformed headers are answered with the whole file,
+    which HTTP allows; a range past the end of the file is a 416.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first + last).isdigit():
+        return None
+
+    if not first:
+        # Suffix range, the last `last` bytes, of which there must be some
+        start = max(0, size - int(last)) if int(last) else size
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+
+    if start >= size:
+        logger.error(header)
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _if_range_matches(header: str, info: ObjectInfo) -> bool:
+    if header.startswith('"'):
+        # Only a strong validator may guard a range
+        return header == info.etag
+    since = parse_http_date(header)
+    return since == info.last_modified.replace(microsecond=0)
+
+
+async def stream_object(request: Request, key: str, filename: str) -> StreamingResponse:
+    """Stream an object to the client chunk by chunk, honouring `Range`.
+
+    Only one chunk is held in memory at a time, whatever the size of the file.
+    """
+    info = await storage.head(key)
+    if info is None:
+        logger.error(key)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header is not None and (
+        if_range is None or _if_range_matches(if_range, info)
+    ):
+        byte_range = parse_range(range_header, info.size)
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=utf-8''{quote(filename)}",
+        "Content-Length": str(info.size),
+    }
+    if byte_range is None:
+        body = storage.stream(key)
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        body = storage.stream(key, start, end)
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Length"] = str(end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+
+    # The object is only opened once the body is sent, so a 304 costs no read
+    response = StreamingResponse(
+        body,
+        status_code=status_code,
+        headers=headers,
+        media_type=info.content_type or "application/octet-stream",
+    )
+    check_not_modified(request, response, info.etag, info.last_modified)
+    return response
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.models import Base
+
+
+class Blob(Base):
+    """An object stored once under its content hash, shared by every file row
+    with the same bytes. Once `ref_count` drops to zero it is left for the
+    sweep to delete, unless an upload of the same bytes revives it first."""
+
+    __tablename__ = "blobs"
+    key: Mapped[str] = mapped_column(unique=True, nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    content_type: Mapped[str] = mapped_column(nullable=False)
+    ref_count: Mapped[int] = mapped_column(nullable=False, default=0)
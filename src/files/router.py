@@ -0,0 +1,61 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, status
+from fastapi.responses import FileResponse
+
+from src.files.storage import storage
+from src.utils.local_storage import LocalStorage
+from src.utils.logger.main import logger
+
+# Serves the signed URLs of local storage, in place of S3
+router = APIRouter(prefix="/files")
+
+
+def get_local_storage() -> LocalStorage:
+    if not isinstance(storage, LocalStorage):
+        logger.error(storage)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return storage
+
+
+def invalid_signature(key: str) -> HTTPException:
+    logger.error(key)
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature"
+    )
+
+
+@router.post("/upload", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_file(
+    local: Annotated[LocalStorage, Depends(get_local_storage)],
+    key: Annotated[str, Form()],
+    content_type: Annotated[str, Form(alias="Content-Type")],
+    size: Annotated[int, Form()],
+    expires: Annotated[int, Form()],
+    signature: Annotated[str, Form()],
+    file: UploadFile,
+) -> None:
+    if not local.verify(signature, expires, "POST", key, content_type, size):
+        raise invalid_signature(key)
+    if file.size != size:
+        logger.error(file.size)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Unexpected file size"
+        )
+    await local.put_file(file.file, key, content_type)
+
+
+@router.get("/{key:path}", status_code=status.HTTP_200_OK)
+async def download_file(
+    key: str,
+    expires: int,
+    signature: str,
+    local: Annotated[LocalStorage, Depends(get_local_storage)],
+) -> FileResponse:
+    if not local.verify(signature, expires, "GET", key):
+        raise invalid_signature(key)
+    info = await local.head(key)
+    if info is None:
+        logger.error(key)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return FileResponse(local.path(key), media_type=info.content_type)
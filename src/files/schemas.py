@@ -1,5 +1,29 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
+SHA256_PATTERN = "^[0-9a-f]{64}$"
+
 
 class FileBase(BaseModel):
     name: str = Field(max_length=40)
+
+
+class UploadRequest(FileBase):
+    content_type: str
+    size: int = Field(ge=0)
+    # Declaring the hash skips the upload if the same bytes are already stored
+    sha256: Optional[str] = Field(None, pattern=SHA256_PATTERN)
+
+
+class PresignedUpload(BaseModel):
+    # All None when the file is already stored, finalize with its hash
+    url: Optional[str]
+    fields: Optional[dict[str, str]]
+    key: Optional[str]
+    expires_in: Optional[int]
+
+
+class UploadFinalize(FileBase):
+    key: Optional[str] = None
+    sha256: Optional[str] = Field(None, pattern=SHA256_PATTERN)
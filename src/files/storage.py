@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from src.config import settings
+from src.utils.aws.s3 import AsyncS3Client
+from src.utils.local_storage import LocalStorage
+from src.utils.storage import StorageBackend
+
+storage: StorageBackend = (
+    LocalStorage(
+        Path(settings.LOCAL_STORAGE_PATH),
+        settings.LOCAL_STORAGE_URL,
+        settings.AWS_TRANSFER_CONCURRENCY,
+    )
+    if settings.STORAGE_BACKEND == "local"
+    else AsyncS3Client("s3", settings.AWS_TRANSFER_CONCURRENCY)
+)
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException, Request, status
+from multipart.multipart import (  # type: ignore[import-untyped]
+    MultipartParser,
+    parse_options_header,
+)
+
+from src.config import settings
+from src.files.blobs import upload_key
+from src.files.dependencies import (
+    check_content,
+    check_file,
+    check_size,
+    header_size,
+)
+from src.files.storage import storage
+from src.utils.logger.main import logger
+
+# Boundaries, part headers and small fields around the file in a form
+FORM_OVERHEAD = 64 * 1024
+
+# Routes reading the body themselves still document it in the OpenAPI schema
+FILE_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+
+@dataclass
+class StreamedFile:
+    filename: str
+    content_type: str
+    key: str
+    sha256: str
+    size: int
+
+
+class MultipartUploadWriter:
+    """Uploads a byte stream to S3 in AWS_UPLOAD_PART_SIZE parts.
+
+    At most AWS_UPLOAD_CONCURRENCY parts are in flight at once, so memory use
+    stays bounded by the part size times that, whatever the file size.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._upload_id: Optional[str] = None
+        self._buffer = bytearray()
+        self._next_part = 1
+        self._in_flight: set[asyncio.Future[tuple[int, str]]] = set()
+        self._etags: dict[int, str] = {}
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.size += len(data)
+        self.sha256.update(data)
+
+    async def drain(self) -> None:
+        part_size = settings.AWS_UPLOAD_PART_SIZE
+        while len(self._buffer) >= part_size:
+            part = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+            await self._send(part)
+
+    async def finish(self) -> None:
+        await self.drain()
+        if self._buffer or self._next_part == 1:
+            await self._send(bytes(self._buffer))
+            self._buffer.clear()
+        await self._wait(return_when=asyncio.ALL_COMPLETED)
+        assert self._upload_id is not None
+        await storage.complete_multipart_upload(self.key, self._upload_id, self._etags)
+
+    async def abort(self) -> None:
+        for task in self._in_flight:
+            task.cancel()
+        if self._upload_id is not None:
+            await storage.abort_multipart_upload(self.key, self._upload_id)
+
+    async def _send(self, part: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = await storage.create_multipart_upload(self.key)
+        if len(self._in_flight) >= settings.AWS_UPLOAD_CONCURRENCY:
+            await self._wait(return_when=asyncio.FIRST_COMPLETED)
+
+        number = self._next_part
+        self._next_part += 1
+        self._in_flight.add(asyncio.ensure_future(self._upload_part(number, part)))
+
+    async def _upload_part(self, number: int, part: bytes) -> tuple[int, str]:
+        assert self._upload_id is not None
+        etag = await storage.upload_part(self.key, self._upload_id, number, part)
+        return number, etag
+
+    async def _wait(self, return_when: str) -> None:
+        if not self._in_flight:
+            return
+        done, self._in_flight = await asyncio.wait(
+            self._in_flight, return_when=return_when
+        )
+        for task in done:
+            number, etag = task.result()
+            self._etags[number] = etag
+
+
+@dataclass
+class _FormState:
+    key: str
+    content_length: Optional[int] = None
+    headers: dict[bytes, bytes] = field(default_factory=dict)
+    header_field: bytes = b""
+    header_value: bytes = b""
+    in_file: bool = False
+    filename: str = ""
+    content_type: str = ""
+    writer: Optional[MultipartUploadWriter] = None
+    header: Optional[bytearray] = None
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition"))
+        # Only the first `file` field is uploaded, anything else is skipped
+        self.in_file = options.get(b"name") == b"file" and self.writer is None
+        if not self.in_file:
+            return
+        self.filename = options.get(b"filename", b"").decode()
+        self.content_type = self.headers.get(b"content-type", b"").decode()
+        check_file(self.filename, self.content_type)
+        if self.content_length is not None:
+            # Rejected before reading any of the file
+            check_size(self.content_length - FORM_OVERHEAD, self.content_type)
+        self.writer = MultipartUploadWriter(self.key)
+        self.header = bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self.in_file or self.writer is None:
+            return
+        self.writer.write(data[start:end])
+        check_size(self.writer.size, self.content_type)
+        # Checked as soon as the header is in, well before a part is uploaded
+        if self.header is not None:
+            self.header += data[start:end]
+            if len(self.header) >= header_size(self.content_type):
+                self._check_header()
+
+    def on_part_end(self) -> None:
+        if self.in_file and self.header is not None:
+            self._check_header()
+        self.in_file = False
+
+    def _check_header(self) -> None:
+        assert self.header is not None
+        header = bytes(self.header[: header_size(self.content_type)])
+        self.header = None
+        check_content(header, self.content_type)
+
+
+async def stream_upload(request: Request, proj_id: UUID) -> StreamedFile:
+    """Stream the `file` field of a multipart request body straight to S3.
+
+    The body is parsed and hashed as it arrives, nothing is spooled to disk.
+    It lands under an upload key, to be moved to its blob once the hash is
+    known. Files too large or not of their declared type are rejected as soon
+    as that shows, without reading the rest of the body.
+    """
+    content_type, params = parse_options_header(request.headers.get("Content-Type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        logger.error(content_type)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file"
+        )
+
+    content_length = request.headers.get("Content-Length")
+    state = _FormState(
+        key=upload_key(proj_id),
+        content_length=int(content_length) if content_length else None,
+    )
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": state.on_part_begin,
+            "on_header_field": state.on_header_field,
+            "on_header_value": state.on_header_value,
+            "on_header_end": state.on_header_end,
+            "on_headers_finished": state.on_headers_finished,
+            "on_part_data": state.on_part_data,
+            "on_part_end": state.on_part_end,
+        },
+    )
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if state.writer is not None:
+                await state.writer.drain()
+        parser.finalize()
+        if state.writer is None:
+            logger.error(state.writer)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file"
+            )
+        await state.writer.finish()
+    except BaseException:
+        if state.writer is not None:
+            await state.writer.abort()
+        raise
+
+    return StreamedFile(
+        filename=state.filename,
+        content_type=state.content_type,
+        key=state.writer.key,
+        sha256=state.writer.sha256.hexdigest(),
+        size=state.writer.size,
+    )
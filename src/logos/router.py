@@ -1,72 +1,126 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, UploadFile, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-from src.files.dependencies import valid_file
+from src.database import get_db, get_read_db
+from src.files import blobs, direct, download
+from src.files import schemas as file_schemas
+from src.files.storage import storage
+from src.files.streaming import FILE_UPLOAD_BODY, stream_upload
 from src.logos import models as logo_models
 from src.logos import schemas as logo_schemas
 from src.logos import service as logo_service
-from src.logos.dependencies import get_logo_by_id
-from src.projects import models as proj_models
-from src.projects.dependencies import get_proj_by_id
-from src.users import schemas as user_schemas
-from src.users.dependencies import get_curr_user, is_participant
+from src.logos.dependencies import get_project_logo
+from src.projects.dependencies import ProjectContext, get_project_context
+from src.utils.http import check_not_modified, make_etag
 from src.utils.logger.main import logger
+from src.utils.storage import url_window_start
 
 router = APIRouter()
 
 
-@router.post("/projects/{proj_id}/logo", status_code=status.HTTP_201_CREATED)
-def upload_logo(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    logo: Annotated[UploadFile, Depends(valid_file)],
-    user: Annotated[user_schemas.User, Depends(is_participant)],
-    db: Annotated[Session, Depends(get_db)],
+@router.post(
+    "/projects/{proj_id}/logo",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=FILE_UPLOAD_BODY,
+)
+async def upload_logo(
+    request: Request,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> logo_schemas.Logo:
+    # Streamed and checked as it arrives, so an oversized or malformed image is
+    # refused before the rest of it is read, and no connection is held meanwhile
+    await db.close()
+    logo = await stream_upload(request, context.project.id)
     log_msg = "User: %s, Uploaded: %s to Project: %s"
-    logger.warning(log_msg, user.username, logo, project.name)
-    return logo_service.create(logo, project, user, db)
+    logger.warning(log_msg, context.user.username, logo, context.project.name)
+    # Detached by the close, attached again to point it at the new logo
+    db.add(context.project)
+    blob = await blobs.store_upload(
+        logo.key, logo.sha256, logo.size, logo.content_type, "logos", db
+    )
+    return await logo_service.add(
+        logo.filename, blob, context.project, context.user, db
+    )
 
 
-@router.get(
-    "/projects/{proj_id}/logo",
-    dependencies=[Depends(is_participant)],
-    status_code=status.HTTP_200_OK,
-)
-def download_logo(
+@router.post("/projects/{proj_id}/logo/upload-url", status_code=status.HTTP_200_OK)
+async def presign_logo_upload(
+    upload: file_schemas.UploadRequest,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> file_schemas.PresignedUpload:
+    return await direct.presign_upload(upload, context.project.id, "logos", db)
+
+
+@router.post("/projects/{proj_id}/logo/finalize", status_code=status.HTTP_201_CREATED)
+async def finalize_logo_upload(
+    upload: file_schemas.UploadFinalize,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> logo_schemas.Logo:
+    blob = await direct.finalize_upload(upload, context.project.id, "logos", db)
+    log_msg = "User: %s, Uploaded: %s to Project: %s"
+    logger.warning(log_msg, context.user.username, upload.name, context.project.name)
+    return await logo_service.add(upload.name, blob, context.project, context.user, db)
+
+
+@router.get("/projects/{proj_id}/logo", status_code=status.HTTP_200_OK)
+async def download_logo(
     proj_id: UUID,
-    proj_logo: Annotated[logo_models.Logo, Depends(get_logo_by_id)],
+    request: Request,
+    response: Response,
+    proj_logo: Annotated[logo_models.Logo, Depends(get_project_logo)],
 ) -> logo_schemas.Logo:
+    window = url_window_start()
+    etag = make_etag(proj_logo.id, proj_logo.updated_at.isoformat(), window.isoformat())
+    check_not_modified(request, response, etag, max(proj_logo.updated_at, window))
     return logo_service.read(proj_logo, proj_id)
 
 
+@router.get("/projects/{proj_id}/logo/content", status_code=status.HTTP_200_OK)
+async def download_logo_content(
+    request: Request,
+    proj_logo: Annotated[logo_models.Logo, Depends(get_project_logo)],
+) -> StreamingResponse:
+    return await download.stream_object(
+        request, storage.key_from_url(proj_logo.url), proj_logo.name
+    )
+
+
 @router.put(
     "/projects/{proj_id}/logo",
-    dependencies=[Depends(is_participant)],
     status_code=status.HTTP_200_OK,
+    openapi_extra=FILE_UPLOAD_BODY,
 )
-def update_logo(
+async def update_logo(
     proj_id: UUID,
-    logo: Annotated[logo_models.Logo, Depends(get_logo_by_id)],
-    file: Annotated[UploadFile, Depends(valid_file)],
-    db: Annotated[Session, Depends(get_db)],
+    request: Request,
+    logo: Annotated[logo_models.Logo, Depends(get_project_logo)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> logo_schemas.Logo:
+    await db.close()
+    file = await stream_upload(request, proj_id)
     log_msg = "Updated Logo: %s to Logo: %s"
     logger.warning(log_msg, logo, file)
-    return logo_service.update(logo, proj_id, file, db)
+    db.add(logo)
+    blob = await blobs.store_upload(
+        file.key, file.sha256, file.size, file.content_type, "logos", db
+    )
+    return await logo_service.update(logo, proj_id, file.filename, blob, db)
 
 
 @router.delete(
     "/projects/{proj_id}/logo",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_logo(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    logo: Annotated[logo_models.Logo, Depends(get_logo_by_id)],
-    curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
+async def delete_logo(
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    logo: Annotated[logo_models.Logo, Depends(get_project_logo)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> None:
-    logo_service.delete(logo, curr_user.id, project, db)
+    await logo_service.delete(logo, context.user.id, context.project, db)
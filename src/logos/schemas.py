@@ -1,3 +1,4 @@
+from typing import Optional
 from uuid import UUID
 
 from pydantic import ConfigDict
@@ -9,5 +10,6 @@ class Logo(file_schemas.FileBase):
     model_config = ConfigDict(from_attributes=True)
 
     url: str
+    download_url: Optional[str] = None
     id: UUID
     owner_id: UUID
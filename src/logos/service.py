@@ -1,62 +1,85 @@
+from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.files import blobs
+from src.files.models import Blob
+from src.files.storage import storage
 from src.logos import models as logo_models
 from src.logos import schemas as logo_schemas
 from src.projects import models as proj_models
 from src.users import schemas as user_schemas
-from src.utils.aws.s3 import S3Client
 from src.utils.logger.main import logger
 
-s3 = S3Client()
-
 
 def read(logo: logo_models.Logo, proj_id: UUID) -> logo_schemas.Logo:
     logo_schema = logo_schemas.Logo.model_validate(logo)
-    # Due to API Gateway problems we're only returning URL to the Logo
-    # res = s3.download(f"{proj_id}_{logo_schema.name}", "logos")
+    # Clients fetch the bytes straight from storage through the signed URL,
+    # or have the API stream them from the `/content` endpoint
+    logo_schema.download_url = storage.presign(storage.key_from_url(logo_schema.url))
     return logo_schema
 
 
-def create(
+async def create(
     logo_file: UploadFile,
     project: proj_models.Project,
     user: user_schemas.User,
-    db: Session,
+    db: AsyncSession,
 ) -> logo_schemas.Logo:
-    unprocessed_url = s3.upload(logo_file, project.id, "logos")
-    url = unprocessed_url.replace("logos", "resized_logos")
+    blob = await blobs.store_file(logo_file, "logos", db)
+    return await add(str(logo_file.filename), blob, project, user, db)
+
+
+def resized_key(key: str) -> str:
+    # Uploaded logos are resized into resized_logos/ by a Lambda
+    return key.replace("logos", "resized_logos", 1)
+
 
-    logo = logo_models.Logo(name=str(logo_file.filename), url=url, owner_id=user.id)
+async def add(
+    name: str,
+    blob: Blob,
+    project: proj_models.Project,
+    user: user_schemas.User,
+    db: AsyncSession,
+) -> logo_schemas.Logo:
+    url = storage.object_url(resized_key(blob.key))
+    logo = logo_models.Logo(name=name, url=url, blob_id=blob.id, owner_id=user.id)
 
     db.add(logo)
-    db.commit()
+    await db.flush()
 
     project.logo_id = logo.id
-    db.commit()
+    await db.commit()
 
     return logo_schemas.Logo.model_validate(logo)
 
 
-def update(
-    logo: logo_models.Logo, proj_id: UUID, file: UploadFile, db: Session
+async def update(
+    logo: logo_models.Logo, proj_id: UUID, name: str, blob: Blob, db: AsyncSession
 ) -> logo_schemas.Logo:
-    s3.delete(f"{proj_id}_{logo.name}", "resized_logos")
-
-    logo.name = str(file.filename)
-    logo.url = s3.upload(file, proj_id, "logos")
-    db.commit()
+    replaced = [(logo.name, logo.blob_id)]
+    keys = legacy_keys(proj_id, replaced)
+
+    logo.name = name
+    logo.url = storage.object_url(resized_key(blob.key))
+    logo.blob_id = blob.id
+    await db.flush()
+    await blobs.release(blobs.blob_ids(replaced), db)
+    await db.commit()
+    # Only once committed: a failed commit leaves orphaned objects at worst,
+    # never rows pointing at deleted ones
+    await storage.delete_many(keys)
 
     return logo_schemas.Logo.model_validate(logo)
 
 
-def delete(
+async def delete(
     logo: logo_models.Logo,
     curr_user_id: UUID,
     project: proj_models.Project,
-    db: Session,
+    db: AsyncSession,
 ) -> None:
     if project.owner_id != curr_user_id:
         log_msg = "Current User: %s - IS NOT OWNER - Owner: %s"
@@ -66,6 +89,19 @@ def delete(
             detail="Only Project owner can delete the Logo",
         )
 
-    s3.delete(f"{project.id}_{logo.name}", "resized_logos")
-    db.delete(logo)
-    db.commit()
+    await db.delete(logo)
+    await db.flush()
+    deleted = [(logo.name, logo.blob_id)]
+    keys = legacy_keys(project.id, deleted)
+    await blobs.release(blobs.blob_ids(deleted), db)
+    await db.commit()
+    await storage.delete_many(keys)
+
+
+def legacy_keys(project_id: UUID, files: list[tuple[str, Optional[UUID]]]) -> list[str]:
+    """Objects of (name, blob id) logos stored before content addressing."""
+    return [
+        f"resized_logos/{project_id}_{name}"
+        for name, blob_id in files
+        if blob_id is None
+    ]
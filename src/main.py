@@ -1,22 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
+from src.config import settings
+from src.database import engine, replica_engine, warm_up
 from src.documents import router as documents_router
+from src.files import blobs
+from src.files import router as files_router
 from src.logos import router as logos_router
 from src.projects import router as projects_router
 from src.users import router as auth_router
 from src.utils.logger.main import setup_logging
+from src.utils.metrics import metrics
 
 setup_logging()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await warm_up(engine, settings.DB_POOL_WARMUP)
+    if replica_engine is not None:
+        await warm_up(replica_engine, settings.DB_POOL_WARMUP)
+    sweeper = asyncio.create_task(
+        blobs.sweep_forever(
+            settings.BLOB_SWEEP_INTERVAL, settings.BLOB_SWEEP_BATCH_SIZE
+        )
+    )
+    yield
+    sweeper.cancel()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.include_router(projects_router.router)
 app.include_router(auth_router.router)
 app.include_router(documents_router.router)
 app.include_router(logos_router.router)
+if settings.STORAGE_BACKEND == "local":
+    app.include_router(files_router.router)
 
 
 @app.get("/health")
 def read_health() -> dict[str, str]:
     return {"status": "It's ALIVE!"}
+
+
+@app.get("/metrics")
+def read_metrics() -> dict[str, float | dict[str, float]]:
+    return metrics.snapshot()
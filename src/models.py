@@ -1,7 +1,8 @@
 from datetime import datetime
+from typing import Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import DateTime, ForeignKey, func
+from sqlalchemy import DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
 
 
@@ -24,10 +25,24 @@ class BaseDocument(Base):
     def owner_id(self) -> Mapped[UUID]:
         return mapped_column(ForeignKey("users.id"), nullable=True)
 
+    # Rows stored before content addressing have no blob, their object is
+    # still keyed by project and file name
+    @declared_attr
+    def blob_id(self) -> Mapped[Optional[UUID]]:
+        return mapped_column(ForeignKey("blobs.id"), nullable=True, index=True)
+
 
 class ProjectUser(Base):
     __tablename__ = "m2m_projects_users"
+    __table_args__ = (
+        Index(
+            "ix_m2m_projects_users_user_id_project_id",
+            "user_id",
+            "project_id",
+            unique=True,
+        ),
+    )
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), primary_key=True)
     project_id: Mapped[UUID] = mapped_column(
-        ForeignKey("projects.id"), primary_key=True
+        ForeignKey("projects.id"), primary_key=True, index=True
     )
@@ -1,21 +1,84 @@
-from typing import Annotated
+from dataclasses import dataclass
+from typing import Annotated, Optional
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_read_db
+from src.logos import models as logo_models
+from src.models import ProjectUser
 from src.projects import models
+from src.projects.membership import memberships
+from src.users import models as user_models
+from src.users import schemas as user_schemas
+from src.users.dependencies import CachedUser, get_token_user, invalid_credentials
 from src.utils.logger.main import logger
 
+# Resolves the caller, the project (with its logo) and the caller's membership
+# in a single round-trip
+project_context = (
+    select(
+        user_models.User,
+        models.Project,
+        logo_models.Logo,
+        ProjectUser.user_id.is_not(None).label("is_member"),
+    )
+    .select_from(user_models.User)
+    .outerjoin(models.Project, models.Project.id == bindparam("proj_id"))
+    .outerjoin(logo_models.Logo, logo_models.Logo.id == models.Project.logo_id)
+    .outerjoin(
+        ProjectUser,
+        and_(
+            ProjectUser.project_id == models.Project.id,
+            ProjectUser.user_id == user_models.User.id,
+        ),
+    )
+    .where(user_models.User.id == bindparam("user_id"))
+)
+# Enough once the caller is already known to be a member
+project_with_logo = (
+    select(models.Project, logo_models.Logo)
+    .outerjoin(logo_models.Logo, logo_models.Logo.id == models.Project.logo_id)
+    .where(models.Project.id == bindparam("proj_id"))
+)
 
-def get_proj_by_id(
-    proj_id: UUID, db: Annotated[Session, Depends(get_db)]
-) -> models.Project:
-    project = db.query(models.Project).filter(models.Project.id == proj_id).first()
-    if not project:
-        logger.error(project)
+
+@dataclass
+class ProjectContext:
+    user: user_schemas.User
+    project: models.Project
+    logo: Optional[logo_models.Logo]
+
+
+async def get_project_context(
+    proj_id: UUID,
+    cached: Annotated[CachedUser, Depends(get_token_user)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+) -> ProjectContext:
+    if cached.username is not None and await memberships.contains(cached.id, proj_id):
+        found = (await db.execute(project_with_logo, {"proj_id": proj_id})).first()
+        if found is not None:
+            user = user_schemas.User(id=cached.id, username=cached.username)
+            return ProjectContext(user=user, project=found[0], logo=found[1])
+
+    row = (
+        await db.execute(project_context, {"proj_id": proj_id, "user_id": cached.id})
+    ).first()
+    if row is None:
+        logger.error(row)
+        raise invalid_credentials()
+
+    user, project, logo, is_member = row
+    if not is_member:
+        logger.error(is_member)
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+            status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden access"
         )
-    return project
+
+    cached.username = user.username
+    await memberships.add(cached.id, proj_id)
+    return ProjectContext(
+        user=user_schemas.User.model_validate(user), project=project, logo=logo
+    )
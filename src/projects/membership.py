@@ -0,0 +1,44 @@
+import time
+from typing import Protocol
+from uuid import UUID
+
+from src.config import settings
+from src.utils.cache import TTLCache
+
+
+class MembershipBackend(Protocol):
+    """Where known (user, project) memberships are remembered.
+
+    Only memberships that exist are stored, so a miss just means the caller
+    has to ask the database. Implementations shared between processes (e.g.
+    Redis) must also drop a project's entries on `discard_project`.
+    """
+
+    async def contains(self, user_id: UUID, project_id: UUID) -> bool:
+        ...
+
+    async def add(self, user_id: UUID, project_id: UUID) -> None:
+        ...
+
+    async def discard_project(self, project_id: UUID) -> None:
+        ...
+
+
+class InMemoryMembershipBackend:
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.ttl = ttl
+        self._cache: TTLCache[tuple[UUID, UUID], bool] = TTLCache("membership", maxsize)
+
+    async def contains(self, user_id: UUID, project_id: UUID) -> bool:
+        return self._cache.get((user_id, project_id)) is not None
+
+    async def add(self, user_id: UUID, project_id: UUID) -> None:
+        self._cache.set((user_id, project_id), True, time.time() + self.ttl)
+
+    async def discard_project(self, project_id: UUID) -> None:
+        self._cache.discard_where(lambda key, _: key[1] == project_id)
+
+
+memberships: MembershipBackend = InMemoryMembershipBackend(
+    settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_CACHE_TTL
+)
@@ -14,9 +14,11 @@ class Project(Base):
     users = relationship(
         "User", secondary="m2m_projects_users", back_populates="projects"
     )
-    owner_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=True)
+    owner_id: Mapped[UUID] = mapped_column(
+        ForeignKey("users.id"), nullable=True, index=True
+    )
     owner = relationship("User")
     logo_id: Mapped[UUID] = mapped_column(
-        ForeignKey("logos.id", ondelete="SET NULL"), nullable=True
+        ForeignKey("logos.id", ondelete="SET NULL"), nullable=True, index=True
     )
     documents = relationship("Document", backref="projects")
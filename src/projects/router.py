@@ -1,81 +1,94 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-from src.projects import models as proj_models
+from src.database import get_db, get_read_db
 from src.projects import schemas as proj_schemas
 from src.projects import service as proj_service
-from src.projects.dependencies import get_proj_by_id
+from src.projects.dependencies import ProjectContext, get_project_context
 from src.users import schemas as user_schemas
-from src.users.dependencies import get_curr_user, is_participant
+from src.users.dependencies import get_curr_user
+from src.utils.http import check_not_modified, make_etag
 from src.utils.logger.main import logger
 
 router = APIRouter(prefix="/projects")
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def read_projects(
+async def read_projects(
     curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
-) -> list[proj_schemas.Project]:
-    return proj_service.read_all(curr_user.id, db)
-
-
-@router.get(
-    "/{proj_id}/info",
-    dependencies=[Depends(is_participant)],
-    status_code=status.HTTP_200_OK,
-)
-def read_project(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    limit: int = Query(20, ge=1, le=100, title="Limit"),
+    cursor: Optional[str] = Query(None, title="Cursor"),
+    include_stats: bool = Query(False, title="Include stats"),
+) -> proj_schemas.PaginatedProjects:
+    return await proj_service.read_all(curr_user.id, limit, cursor, include_stats, db)
+
+
+@router.get("/{proj_id}/info", status_code=status.HTTP_200_OK)
+async def read_project(
+    request: Request,
+    response: Response,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
 ) -> proj_schemas.Project:
+    project = context.project
+    etag = make_etag(project.id, project.updated_at.isoformat())
+    check_not_modified(request, response, etag, project.updated_at)
     return proj_service.read(project)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def create_project(
+async def create_project(
     project: proj_schemas.ProjectCreate,
     curr_user: Annotated[user_schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> proj_schemas.Project:
     log_msg = "User: %s created Project: %s"
     logger.warning(log_msg, curr_user.username, project.model_dump())
-    return proj_service.create(project, curr_user.id, db)
+    return await proj_service.create(project, curr_user.id, db)
 
 
-@router.put(
-    "/{proj_id}/info",
-    dependencies=[Depends(is_participant)],
-    status_code=status.HTTP_200_OK,
-)
-def update_project(
+@router.put("/{proj_id}/info", status_code=status.HTTP_200_OK)
+async def update_project(
     proj_update: proj_schemas.ProjectUpdate,
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    db: Annotated[Session, Depends(get_db)],
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> proj_schemas.Project:
     log_msg = "Updated Project: %s to Project: %s"
-    logger.warning(log_msg, project.name, proj_update)
-    return proj_service.update(project, proj_update, db)
+    logger.warning(log_msg, context.project.name, proj_update)
+    return await proj_service.update(context.project, proj_update, db)
 
 
 @router.delete("/{proj_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
-    user: Annotated[user_schemas.User, Depends(is_participant)],
-    db: Annotated[Session, Depends(get_db)],
+async def delete_project(
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> None:
-    return proj_service.delete(project, user.id, db)
+    return await proj_service.delete(context.project, context.user.id, db)
 
 
 @router.post("/{proj_id}/invite", status_code=status.HTTP_201_CREATED)
-def invite_to_project(
-    project: Annotated[proj_models.Project, Depends(get_proj_by_id)],
+async def invite_to_project(
+    context: Annotated[ProjectContext, Depends(get_project_context)],
     user: Annotated[str, Query(...)],
-    owner: Annotated[user_schemas.User, Depends(is_participant)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> None:
     log_msg = "User: %s, invited User: %s to Project: %s"
-    logger.warning(log_msg, owner.username, user, project.name)
-    return proj_service.invite(project, user, owner.id, db)
+    logger.warning(log_msg, context.user.username, user, context.project.name)
+    return await proj_service.invite(context.project, user, context.user.id, db)
+
+
+@router.post("/{proj_id}/invite/bulk", status_code=status.HTTP_200_OK)
+async def bulk_invite_to_project(
+    invite: proj_schemas.ProjectBulkInvite,
+    context: Annotated[ProjectContext, Depends(get_project_context)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> list[proj_schemas.InviteResult]:
+    log_msg = "User: %s, invited Users: %s to Project: %s"
+    logger.warning(
+        log_msg, context.user.username, invite.usernames, context.project.name
+    )
+    return await proj_service.invite_many(
+        context.project, invite.usernames, context.user.id, db
+    )
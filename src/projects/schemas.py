@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -24,3 +24,25 @@ class Project(ProjectBase):
 class ProjectUpdate(BaseModel):
     name: Optional[str] = Field(max_length=40)
     description: Optional[str] = None
+
+
+class ProjectSummary(Project):
+    document_count: Optional[int] = None
+    logo_url: Optional[str] = None
+
+
+class PaginatedProjects(BaseModel):
+    projects: list[ProjectSummary]
+    next_cursor: Optional[str] = None
+
+
+class ProjectBulkInvite(BaseModel):
+    usernames: list[str] = Field(min_length=1, max_length=500)
+
+
+InviteStatus = Literal["invited", "already_member", "not_found"]
+
+
+class InviteResult(BaseModel):
+    username: str
+    status: InviteStatus
@@ -1,49 +1,101 @@
+from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import String, any_, bindparam, func, select, tuple_
+from sqlalchemy import delete as sql_delete
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.documents import models as doc_models
 from src.documents import service as doc_service
-from src.logos.dependencies import get_logo_by_id
+from src.files import blobs
+from src.files.storage import storage
+from src.logos import models as logo_models
+from src.logos import service as logo_service
 from src.models import ProjectUser
 from src.projects import models as proj_models
 from src.projects import schemas
+from src.projects.membership import memberships
+from src.users import models as user_models
 from src.users.dependencies import get_user_by_username
-from src.utils.aws.s3 import S3Client
 from src.utils.logger.main import logger
-
-s3 = S3Client()
-
-
-def read_all(user_id: UUID, db: Session) -> list[schemas.Project]:
-    proj_list_orm = (
-        db.query(proj_models.Project)
+from src.utils.pagination import decode_cursor, encode_cursor
+
+# One round-trip for the whole list, bound as a single array parameter
+users_by_usernames = select(user_models.User.id, user_models.User.username).where(
+    user_models.User.username == any_(bindparam("usernames", type_=ARRAY(String)))
+)
+
+
+async def read_all(
+    user_id: UUID,
+    limit: int,
+    cursor: Optional[str],
+    include_stats: bool,
+    db: AsyncSession,
+) -> schemas.PaginatedProjects:
+    stmt = (
+        select(proj_models.Project)
         .join(ProjectUser)
-        .filter(ProjectUser.user_id == user_id)
-        .all()
+        .where(ProjectUser.user_id == user_id)
+        .order_by(proj_models.Project.created_at, proj_models.Project.id)
+        .limit(limit + 1)
     )
-    return [schemas.Project.model_validate(proj) for proj in proj_list_orm]
+    if include_stats:
+        stmt = (
+            stmt.add_columns(func.count(doc_models.Document.id), logo_models.Logo.url)
+            .outerjoin(
+                doc_models.Document,
+                doc_models.Document.project_id == proj_models.Project.id,
+            )
+            .outerjoin(
+                logo_models.Logo, logo_models.Logo.id == proj_models.Project.logo_id
+            )
+            .group_by(proj_models.Project.id, logo_models.Logo.id)
+        )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(proj_models.Project.created_at, proj_models.Project.id)
+            > decode_cursor(cursor)
+        )
+    rows = (await db.execute(stmt)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    projects = []
+    for row in rows:
+        project = schemas.ProjectSummary.model_validate(row[0])
+        if include_stats:
+            project.document_count, project.logo_url = row[1], row[2]
+        projects.append(project)
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return schemas.PaginatedProjects(projects=projects, next_cursor=next_cursor)
 
 
 def read(project: proj_models.Project) -> schemas.Project:
     return schemas.Project.model_validate(project)
 
 
-def create(
-    proj_create: schemas.ProjectCreate, user_id: UUID, db: Session
+async def create(
+    proj_create: schemas.ProjectCreate, user_id: UUID, db: AsyncSession
 ) -> schemas.Project:
     project = proj_models.Project(**proj_create.model_dump(), owner_id=user_id)
     db.add(project)
-    db.commit()
+    await db.flush()
 
-    m2m_relationship = ProjectUser(user_id=user_id, project_id=project.id)
-    db.add(m2m_relationship)
-    db.commit()
+    db.add(ProjectUser(user_id=user_id, project_id=project.id))
+    await db.commit()
+    await memberships.add(user_id, project.id)
     return schemas.Project.model_validate(project)
 
 
-def update(
-    project: proj_models.Project, proj_update: schemas.ProjectUpdate, db: Session
+async def update(
+    project: proj_models.Project, proj_update: schemas.ProjectUpdate, db: AsyncSession
 ) -> schemas.Project:
     if proj_update.name is not None and proj_update.name != project.name:
         project.name = proj_update.name
@@ -54,44 +106,113 @@ def update(
     ):
         project.description = proj_update.description
 
-    db.commit()
+    await db.commit()
     return schemas.Project.model_validate(project)
 
 
-def delete(project: proj_models.Project, owner_id: UUID, db: Session) -> None:
-    if project.owner_id != owner_id:
-        log_msg = "Current User: %s - IS NOT OWNER - Owner: %s"
-        logger.error(log_msg, owner_id, project.owner_id)
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only project owner can delete a project",
-        )
+async def delete(
+    project: proj_models.Project, owner_id: UUID, db: AsyncSession
+) -> None:
+    check_owner(project, owner_id, "delete a project")
 
-    if project.documents:
-        for document in project.documents:
-            doc_service.delete(document, owner_id, project.owner_id, db)
+    documents = await db.execute(
+        sql_delete(doc_models.Document)
+        .where(doc_models.Document.project_id == project.id)
+        .returning(doc_models.Document.name, doc_models.Document.blob_id)
+    )
+    doc_files = list(documents.tuples())
+    keys = doc_service.legacy_keys(project.id, doc_files)
+    blob_ids = blobs.blob_ids(doc_files)
 
     if project.logo_id:
-        logo = get_logo_by_id(project.id, db)
-        s3.delete(f"{project.id}_{logo.name}", "resized_logos")
+        logos = await db.execute(
+            sql_delete(logo_models.Logo)
+            .where(logo_models.Logo.id == project.logo_id)
+            .returning(logo_models.Logo.name, logo_models.Logo.blob_id)
+        )
+        logo_files = list(logos.tuples())
+        keys += logo_service.legacy_keys(project.id, logo_files)
+        blob_ids += blobs.blob_ids(logo_files)
+    await blobs.release(blob_ids, db)
 
-    db.delete(project)
-    db.commit()
+    await db.execute(
+        sql_delete(ProjectUser).where(ProjectUser.project_id == project.id)
+    )
+    await db.execute(
+        sql_delete(proj_models.Project).where(proj_models.Project.id == project.id)
+    )
+    await db.commit()
+    # Only once committed: a failed commit leaves orphaned objects at worst,
+    # never rows pointing at deleted ones
+    await storage.delete_many(keys)
+    await memberships.discard_project(project.id)
+    doc_service.invalidate_listing(project.id)
 
 
-def invite(
-    project: proj_models.Project, username: str, owner_id: UUID, db: Session
+def check_owner(
+    project: proj_models.Project, owner_id: UUID, action: str = "invite to project"
 ) -> None:
     if project.owner_id != owner_id:
         log_msg = "Current User: %s - IS NOT OWNER - Owner: %s"
         logger.error(log_msg, owner_id, project.owner_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only project owner can invite to project",
+            detail=f"Only project owner can {action}",
         )
 
-    user_to_invite = get_user_by_username(username, db)
 
-    m2m_relationship = ProjectUser(user_id=user_to_invite.id, project_id=project.id)
-    db.add(m2m_relationship)
-    db.commit()
+async def add_members(
+    project_id: UUID, user_ids: list[UUID], db: AsyncSession
+) -> set[UUID]:
+    """Insert the memberships that don't exist yet, returning the new members."""
+    if not user_ids:
+        return set()
+    inserted = await db.scalars(
+        insert(ProjectUser)
+        .values([{"user_id": uid, "project_id": project_id} for uid in user_ids])
+        .on_conflict_do_nothing(index_elements=["user_id", "project_id"])
+        .returning(ProjectUser.user_id)
+    )
+    return set(inserted)
+
+
+async def invite(
+    project: proj_models.Project, username: str, owner_id: UUID, db: AsyncSession
+) -> None:
+    check_owner(project, owner_id)
+
+    user_to_invite = await get_user_by_username(username, db)
+
+    await add_members(project.id, [user_to_invite.id], db)
+    await db.commit()
+    await memberships.add(user_to_invite.id, project.id)
+
+
+async def invite_many(
+    project: proj_models.Project,
+    usernames: list[str],
+    owner_id: UUID,
+    db: AsyncSession,
+) -> list[schemas.InviteResult]:
+    check_owner(project, owner_id)
+
+    found = await db.execute(users_by_usernames, {"usernames": usernames})
+    user_ids = {username: user_id for user_id, username in found}
+
+    invited = await add_members(project.id, list(user_ids.values()), db)
+    await db.commit()
+    for member_id in invited:
+        await memberships.add(member_id, project.id)
+
+    results = []
+    invite_status: schemas.InviteStatus
+    for username in dict.fromkeys(usernames):
+        user_id = user_ids.get(username)
+        if user_id is None:
+            invite_status = "not_found"
+        elif user_id in invited:
+            invite_status = "invited"
+        else:
+            invite_status = "already_member"
+        results.append(schemas.InviteResult(username=username, status=invite_status))
+    return results
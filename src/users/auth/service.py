@@ -1,7 +1,8 @@
 from datetime import timedelta
 
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
 from src.users import models
@@ -10,18 +11,18 @@ from src.users.auth import schemas as auth_schemas
 from src.utils.auth import authenticate_user, create_token, pwd_context
 
 
-def create(user: user_schemas.UserCreate, db: Session) -> user_schemas.User:
-    hashed_password = pwd_context.hash(user.password)
+async def create(user: user_schemas.UserCreate, db: AsyncSession) -> user_schemas.User:
+    hashed_password = await run_in_threadpool(pwd_context.hash, user.password)
     user_orm = models.User(username=user.username, password_hash=hashed_password)
     db.add(user_orm)
-    db.commit()
+    await db.commit()
     return user_schemas.User.model_validate(user_orm)
 
 
-def login(
-    form_data: OAuth2PasswordRequestForm, db: Session
+async def login(
+    form_data: OAuth2PasswordRequestForm, db: AsyncSession
 ) -> auth_schemas.Token | None:
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         return None
     token_expires = timedelta(minutes=float(settings.TOKEN_EXPIRE_TIME))
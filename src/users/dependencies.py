@@ -1,28 +1,34 @@
-from typing import Annotated
+import time
+from typing import Annotated, Optional
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import exists
+from sqlalchemy import Connection, bindparam, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapper
 
 from src.config import settings
-from src.database import get_db
-from src.models import ProjectUser
+from src.database import get_db, get_read_db
 from src.users import models as user_models
 from src.users import schemas
 from src.utils.auth import MyOAuth2PasswordBearer
+from src.utils.cache import TTLCache
 from src.utils.logger.main import logger
 
 oauth2_scheme = MyOAuth2PasswordBearer(tokenUrl="login")
 
+# Built once so every request reuses the same statement and its cached compilation
+user_by_username = select(user_models.User).where(
+    user_models.User.username == bindparam("username")
+)
+user_by_id = select(user_models.User).where(user_models.User.id == bindparam("user_id"))
 
-def get_user_by_username(
-    username: str, db: Annotated[Session, Depends(get_db)]
+
+async def get_user_by_username(
+    username: str, db: Annotated[AsyncSession, Depends(get_db)]
 ) -> user_models.User:
-    user = (
-        db.query(user_models.User).filter(user_models.User.username == username).first()
-    )
+    user = await db.scalar(user_by_username, {"username": username})
     if not user:
         logger.error(user)
         raise HTTPException(
@@ -31,15 +37,45 @@ def get_user_by_username(
     return user
 
 
-def get_curr_user(
-    db: Annotated[Session, Depends(get_db)],
-    token: Annotated[str, Depends(oauth2_scheme)],
-) -> schemas.User:
-    credentials_exception = HTTPException(
+def invalid_credentials() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+class CachedUser:
+    __slots__ = ("id", "username")
+
+    def __init__(self, user_id: UUID, username: Optional[str] = None) -> None:
+        self.id = user_id
+        # Unset until the user has been loaded from the database
+        self.username = username
+
+
+token_cache: TTLCache[str, CachedUser] = TTLCache("token", settings.TOKEN_CACHE_SIZE)
+
+
+@event.listens_for(user_models.User, "after_update")
+@event.listens_for(user_models.User, "after_delete")
+def invalidate_user(
+    mapper: Mapper[user_models.User],
+    connection: Connection,
+    target: user_models.User,
+) -> None:
+    token_cache.discard_where(lambda _, cached: cached.id == target.id)
+
+
+# Plain `def` dependencies go through the threadpool, needlessly for this
+# in-memory work, so both are async
+async def get_token_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> CachedUser:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -47,32 +83,33 @@ def get_curr_user(
         user_id = payload.get("id")
         if user_id is None:
             logger.error(payload)
-            raise credentials_exception
-    except JWTError as err:
+            raise invalid_credentials()
+        cached = CachedUser(UUID(user_id))
+    except (JWTError, ValueError) as err:
         logger.error(JWTError)
-        raise credentials_exception from err
-    user = db.query(user_models.User).filter(user_models.User.id == user_id).first()
-    if user is None:
-        logger.error(user)
-        raise credentials_exception
-    return schemas.User.model_validate(user)
+        raise invalid_credentials() from err
 
+    expires_at = time.time() + settings.TOKEN_CACHE_TTL
+    if "exp" in payload:
+        expires_at = min(expires_at, float(payload["exp"]))
+    token_cache.set(token, cached, expires_at)
+    return cached
 
-def is_participant(
-    proj_id: UUID,
-    user: Annotated[schemas.User, Depends(get_curr_user)],
-    db: Annotated[Session, Depends(get_db)],
-) -> schemas.User:
-    project_user = db.query(
-        exists().where(
-            ProjectUser.user_id == user.id, ProjectUser.project_id == proj_id
-        )
-    ).scalar()
 
-    if not project_user:
-        logger.error(project_user)
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden access"
-        )
+async def get_token_user_id(
+    cached: Annotated[CachedUser, Depends(get_token_user)],
+) -> str:
+    return str(cached.id)
 
-    return user
+
+async def get_curr_user(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    cached: Annotated[CachedUser, Depends(get_token_user)],
+) -> schemas.User:
+    if cached.username is None:
+        user = await db.scalar(user_by_id, {"user_id": cached.id})
+        if user is None:
+            logger.error(user)
+            raise invalid_credentials()
+        cached.username = user.username
+    return schemas.User(id=cached.id, username=cached.username)
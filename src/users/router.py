@@ -1,10 +1,10 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_db, mark_read_primary
 from src.users import schemas as user_schemas
 from src.users.auth import schemas as auth_schemas
 from src.users.auth import service as auth_service
@@ -14,19 +14,23 @@ router = APIRouter()
 
 
 @router.post("/auth", status_code=status.HTTP_201_CREATED)
-def create_user(
-    user: user_schemas.UserCreate, db: Annotated[Session, Depends(get_db)]
+async def create_user(
+    user: user_schemas.UserCreate,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> user_schemas.User:
     logger.debug(f"Created User {user.model_dump()}")
-    return auth_service.create(user, db)
+    created = await auth_service.create(user, db)
+    mark_read_primary(response)
+    return created
 
 
 @router.post("/login", status_code=status.HTTP_200_OK)
-def login(
+async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ) -> auth_schemas.Token:
-    user = auth_service.login(form_data, db)
+    user = await auth_service.login(form_data, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2,10 +2,12 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
 from src.users import models, schemas
@@ -48,12 +50,16 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, username: str, password: str) -> schemas.User | None:
-    user_orm = db.query(models.User).filter(models.User.username == username).first()
+async def authenticate_user(
+    db: AsyncSession, username: str, password: str
+) -> schemas.User | None:
+    user_orm = await db.scalar(
+        select(models.User).where(models.User.username == username)
+    )
 
     if not user_orm:
         return None
-    if not verify_password(password, user_orm.password_hash):
+    if not await run_in_threadpool(verify_password, password, user_orm.password_hash):
         return None
     user = schemas.UserAuth.model_validate(user_orm)
 
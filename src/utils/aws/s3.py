@@ -1,30 +1,270 @@
-from typing import Any
-from uuid import UUID
+import asyncio
+import hashlib
+import time
+from base64 import b64decode, b64encode
+from typing import IO, Any, AsyncIterator, Optional
 
 import boto3
-from fastapi import UploadFile
+from botocore.exceptions import ClientError
 
 from src.config import settings
+from src.utils.cache import TTLCache
+from src.utils.logger.main import logger
+from src.utils.storage import (
+    DOWNLOAD_CHUNK_SIZE,
+    ObjectInfo,
+    ThreadedBackend,
+    key_from_url,
+)
+
+# DeleteObjects accepts at most this many keys per request
+DELETE_BATCH_SIZE = 1000
+
+# Signed URLs are reused until fewer than AWS_PRESIGN_MARGIN seconds remain
+presigned_urls: TTLCache[str, str] = TTLCache(
+    "presigned_url", settings.AWS_PRESIGN_CACHE_SIZE
+)
 
 
 class S3Client:
     def __init__(self) -> None:
-        self.client = boto3.client("s3")
+        # A local S3 stand-in can be used by pointing AWS_ENDPOINT_URL at it
+        self.client = boto3.client("s3", endpoint_url=settings.AWS_ENDPOINT_URL or None)
 
-    def upload(self, file: UploadFile, proj_id: UUID, folder: str) -> str:
+    def put_file(
+        self, fileobj: IO[bytes], key: str, content_type: Optional[str] = None
+    ) -> str:
+        extra_args = {"ContentType": content_type} if content_type else None
         self.client.upload_fileobj(
-            file.file, settings.AWS_BUCKET_NAME, f"{folder}/{proj_id}_{file.filename}"
+            fileobj, settings.AWS_BUCKET_NAME, key, ExtraArgs=extra_args
+        )
+        return self.object_url(key)
+
+    def copy(self, source_key: str, key: str) -> None:
+        # Server side, the bytes don't pass through the API
+        self.client.copy(
+            {"Bucket": settings.AWS_BUCKET_NAME, "Key": source_key},
+            settings.AWS_BUCKET_NAME,
+            key,
+        )
+
+    def sha256(self, key: str) -> str:
+        res = self.client.get_object(Bucket=settings.AWS_BUCKET_NAME, Key=key)
+        digest = hashlib.sha256()
+        for chunk in res["Body"].iter_chunks(1024 * 1024):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def object_url(self, key: str) -> str:
+        return f"https://{settings.AWS_BUCKET_NAME}.s3.{settings.AWS_DEFAULT_REGION}.amazonaws.com/{key}"
+
+    def presign_post(
+        self, key: str, content_type: str, size: int, sha256: Optional[str] = None
+    ) -> dict[str, Any]:
+        """Let a client upload exactly `size` bytes of `content_type` to `key`.
+
+        With a `sha256`, S3 refuses bytes that don't hash to it and keeps the
+        checksum for `head` to return.
+        """
+        fields = {"Content-Type": content_type}
+        if sha256 is not None:
+            fields["x-amz-checksum-sha256"] = b64encode(bytes.fromhex(sha256)).decode()
+        return dict(
+            self.client.generate_presigned_post(
+                settings.AWS_BUCKET_NAME,
+                key,
+                Fields=fields,
+                Conditions=[
+                    *({name: value} for name, value in fields.items()),
+                    ["content-length-range", size, size],
+                ],
+                ExpiresIn=settings.AWS_UPLOAD_URL_EXPIRY,
+            )
+        )
+
+    def head(self, key: str) -> Optional[dict[str, Any]]:
+        try:
+            res = self.client.head_object(
+                Bucket=settings.AWS_BUCKET_NAME, Key=key, ChecksumMode="ENABLED"
+            )
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return dict(res)
+
+    def create_multipart_upload(self, key: str) -> str:
+        res = self.client.create_multipart_upload(
+            Bucket=settings.AWS_BUCKET_NAME, Key=key
         )
-        url = f"https://{settings.AWS_BUCKET_NAME}.s3.{settings.AWS_DEFAULT_REGION}.amazonaws.com/{folder}/{proj_id}_{file.filename}"
-        return url
+        return str(res["UploadId"])
 
-    def download(self, filename: str, folder: str) -> Any:
-        res = self.client.get_object(
-            Bucket=settings.AWS_BUCKET_NAME, Key=f"{folder}/{filename}"
+    def upload_part(
+        self, key: str, upload_id: str, part_number: int, body: bytes
+    ) -> str:
+        res = self.client.upload_part(
+            Bucket=settings.AWS_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
         )
-        return res
+        return str(res["ETag"])
 
-    def delete(self, filename: str, folder: str) -> None:
-        self.client.delete_object(
-            Bucket=settings.AWS_BUCKET_NAME, Key=f"{folder}/{filename}"
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: dict[int, str]
+    ) -> None:
+        self.client.complete_multipart_upload(
+            Bucket=settings.AWS_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": number, "ETag": etags[number]}
+                    for number in sorted(etags)
+                ]
+            },
         )
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.client.abort_multipart_upload(
+            Bucket=settings.AWS_BUCKET_NAME, Key=key, UploadId=upload_id
+        )
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> Any:
+        """Streaming body of an object, or of its bytes `start` to `end`."""
+        params = {"Bucket": settings.AWS_BUCKET_NAME, "Key": key}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        return self.client.get_object(**params)["Body"]
+
+    def presign(self, key: str) -> str:
+        return self.presign_many([key])[key]
+
+    def presign_many(self, keys: list[str]) -> dict[str, str]:
+        urls = {}
+        expires_at = (
+            time.time() + settings.AWS_PRESIGN_EXPIRY - settings.AWS_PRESIGN_MARGIN
+        )
+        for key in keys:
+            url = presigned_urls.get(key)
+            if url is None:
+                # Signing is local, it doesn't call out to S3
+                url = self.client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": settings.AWS_BUCKET_NAME, "Key": key},
+                    ExpiresIn=settings.AWS_PRESIGN_EXPIRY,
+                )
+                presigned_urls.set(key, url, expires_at)
+            urls[key] = url
+        return urls
+
+    def delete_key(self, key: str) -> None:
+        self.client.delete_object(Bucket=settings.AWS_BUCKET_NAME, Key=key)
+
+    def _delete_batch(self, keys: list[str]) -> None:
+        res = self.client.delete_objects(
+            Bucket=settings.AWS_BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        for error in res.get("Errors", []):
+            logger.error("Failed to delete %s: %s", error["Key"], error["Message"])
+
+
+class AsyncS3Client(ThreadedBackend):
+    """Storage on S3, boto3's blocking calls run on the transfer pool."""
+
+    def __init__(self, name: str, workers: int) -> None:
+        super().__init__(name, workers)
+        self.sync = S3Client()
+
+    async def put_file(
+        self, fileobj: IO[bytes], key: str, content_type: Optional[str] = None
+    ) -> str:
+        return await self._run(self.sync.put_file, fileobj, key, content_type)
+
+    async def copy(self, source_key: str, key: str) -> None:
+        await self._run(self.sync.copy, source_key, key)
+
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        res = await self._run(self.sync.head, key)
+        if res is None:
+            return None
+        checksum = res.get("ChecksumSHA256")
+        # Checksums of multipart objects are of their parts, `<hash>-<n>`
+        if checksum is not None and "-" in checksum:
+            checksum = None
+        return ObjectInfo(
+            size=res["ContentLength"],
+            content_type=res.get("ContentType"),
+            etag=res["ETag"],
+            last_modified=res["LastModified"],
+            sha256=b64decode(checksum).hex() if checksum else None,
+        )
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        body = await self._run(self.sync.open, key, start, end)
+        try:
+            while chunk := await self._run(body.read, DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    async def sha256(self, key: str) -> str:
+        return await self._run(self.sync.sha256, key)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self.sync.delete_key, key)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        # At most AWS_DELETE_CONCURRENCY batches at once, so a large delete
+        # leaves room on the transfer pool for other requests
+        limit = asyncio.Semaphore(settings.AWS_DELETE_CONCURRENCY)
+
+        async def delete_batch(batch: list[str]) -> None:
+            async with limit:
+                await self._run(self.sync._delete_batch, batch)
+
+        await asyncio.gather(
+            *(
+                delete_batch(keys[i : i + DELETE_BATCH_SIZE])
+                for i in range(0, len(keys), DELETE_BATCH_SIZE)
+            )
+        )
+
+    async def create_multipart_upload(self, key: str) -> str:
+        return await self._run(self.sync.create_multipart_upload, key)
+
+    async def upload_part(
+        self, key: str, upload_id: str, part_number: int, body: bytes
+    ) -> str:
+        return await self._run(self.sync.upload_part, key, upload_id, part_number, body)
+
+    async def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: dict[int, str]
+    ) -> None:
+        await self._run(self.sync.complete_multipart_upload, key, upload_id, etags)
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        await self._run(self.sync.abort_multipart_upload, key, upload_id)
+
+    # Signing is local, so these don't need the pool
+
+    def object_url(self, key: str) -> str:
+        return self.sync.object_url(key)
+
+    def key_from_url(self, url: str) -> str:
+        return key_from_url(url, self.object_url(""))
+
+    def presign(self, key: str) -> str:
+        return self.sync.presign(key)
+
+    def presign_many(self, keys: list[str]) -> dict[str, str]:
+        return self.sync.presign_many(keys)
+
+    def presign_post(
+        self, key: str, content_type: str, size: int, sha256: Optional[str] = None
+    ) -> dict[str, Any]:
+        return self.sync.presign_post(key, content_type, size, sha256)
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from src.utils.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU cache whose entries also expire at a time set per entry.
+
+    Hits and misses are reported as `<name>_cache_hits`/`<name>_cache_misses`.
+    """
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = metrics.counter(f"{name}_cache_hits")
+        self.misses = metrics.counter(f"{name}_cache_misses")
+        metrics.gauge(f"{name}_cache_size", lambda: len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return entry[0]
+
+    def set(self, key: K, value: V, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[K, V], bool]) -> None:
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
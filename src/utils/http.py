@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha256
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def make_etag(*parts: object) -> str:
+    digest = sha256("|".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    # If-None-Match uses the weak comparison, W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def parse_http_date(header: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return None
+    # asctime dates and -0000 zones parse naive, HTTP dates are all in GMT
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    since = parse_http_date(header)
+    if since is None:
+        return False
+    # HTTP dates only carry whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> None:
+    """Set the validators on the response, raising 304 if the client is fresh."""
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_none_match is not None:
+        tags = {_opaque_tag(tag) for tag in if_none_match.split(",")}
+        fresh = _opaque_tag(etag) in tags or "*" in tags
+    elif if_modified_since is not None and last_modified is not None:
+        fresh = _not_modified_since(if_modified_since, last_modified)
+    else:
+        fresh = False
+
+    if fresh:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,241 @@
+import hashlib
+import hmac
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, BinaryIO, Optional
+from uuid import uuid4
+
+from src.config import settings
+from src.utils.storage import (
+    DERIVED_FOLDERS,
+    DOWNLOAD_CHUNK_SIZE,
+    ObjectInfo,
+    ThreadedBackend,
+    key_from_url,
+    url_window_start,
+)
+
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage(ThreadedBackend):
+    """Storage in a directory on the API's own disk, e.g. `bucket/`.
+
+    Signed URLs point at the `/files` routes, which serve and accept the
+    files themselves. Content types, which files don't carry, are kept
+    alongside under `.meta/`.
+    """
+
+    def __init__(self, root: Path, base_url: str, workers: int) -> None:
+        super().__init__("local", workers)
+        self.root = root.resolve()
+        self.base_url = base_url.rstrip("/")
+        # Never sign with the JWT key itself, a URL signature mustn't be
+        # usable against tokens or the other way round
+        self.signing_key = (
+            settings.LOCAL_STORAGE_SECRET.encode()
+            or hmac.new(
+                settings.SECRET_KEY.encode(), b"local-storage", "sha256"
+            ).digest()
+        )
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root) or path == self.root:
+            raise ValueError(f"Invalid key {key}")
+        return path
+
+    def _meta_path(self, key: str) -> Path:
+        return self.path(f".meta/{key}")
+
+    def _write(self, fileobj: IO[bytes], key: str, content_type: Optional[str]) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside then renamed, so readers never see a partial file
+        partial = path.with_name(f".{path.name}.{uuid4().hex}")
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(fileobj, f, WRITE_CHUNK_SIZE)
+        os.replace(partial, path)
+        if content_type is not None:
+            meta = self._meta_path(key)
+            meta.parent.mkdir(parents=True, exist_ok=True)
+            meta.write_text(content_type)
+        self._link_derived(key)
+
+    def _link(self, source: Path, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{uuid4().hex}")
+        try:
+            os.link(source, partial)
+        except OSError:
+            # Across file systems, where copyfile still uses sendfile
+            shutil.copyfile(source, partial)
+        os.replace(partial, path)
+
+    def _link_derived(self, key: str) -> None:
+        # There is no resizing pipeline, the originals stand in for its output
+        folder, name = key.split("/", 1)
+        for derived in DERIVED_FOLDERS.get(folder, []):
+            self._link(self.path(key), self.path(f"{derived}/{name}"))
+
+    def _copy(self, source_key: str, key: str) -> None:
+        # Objects are never modified in place, so a hard link is a copy
+        self._link(self.path(source_key), self.path(key))
+        meta = self._meta_path(source_key)
+        if meta.exists():
+            self._link(meta, self._meta_path(key))
+        self._link_derived(key)
+
+    def _head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            return None
+        meta = self._meta_path(key)
+        return ObjectInfo(
+            size=stat.st_size,
+            content_type=meta.read_text() if meta.exists() else None,
+            etag=f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            last_modified=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        )
+
+    def _open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def _sha256(self, key: str) -> str:
+        digest = hashlib.sha256()
+        with open(self.path(key), "rb") as f:
+            while chunk := f.read(WRITE_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _delete(self, keys: list[str]) -> None:
+        for key in keys:
+            folder, name = key.split("/", 1)
+            for derived in DERIVED_FOLDERS.get(folder, []):
+                self.path(f"{derived}/{name}").unlink(missing_ok=True)
+            self._meta_path(key).unlink(missing_ok=True)
+            self.path(key).unlink(missing_ok=True)
+
+    def _upload_dir(self, upload_id: str) -> Path:
+        return self.path(f".multipart/{upload_id}")
+
+    def _create_multipart_upload(self) -> str:
+        upload_id = uuid4().hex
+        self._upload_dir(upload_id).mkdir(parents=True)
+        return upload_id
+
+    def _upload_part(self, upload_id: str, part_number: int, body: bytes) -> str:
+        (self._upload_dir(upload_id) / str(part_number)).write_bytes(body)
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _complete_multipart_upload(
+        self, key: str, upload_id: str, etags: dict[int, str]
+    ) -> None:
+        parts = self._upload_dir(upload_id)
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{uuid4().hex}")
+        with open(partial, "wb") as f:
+            for number in sorted(etags):
+                with open(parts / str(number), "rb") as part:
+                    shutil.copyfileobj(part, f, WRITE_CHUNK_SIZE)
+        os.replace(partial, path)
+        shutil.rmtree(parts)
+        self._link_derived(key)
+
+    async def put_file(
+        self, fileobj: IO[bytes], key: str, content_type: Optional[str] = None
+    ) -> str:
+        await self._run(self._write, fileobj, key, content_type)
+        return self.object_url(key)
+
+    async def copy(self, source_key: str, key: str) -> None:
+        await self._run(self._copy, source_key, key)
+
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        return await self._run(self._head, key)
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        f = await self._run(self._open, key)
+        try:
+            await self._run(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = DOWNLOAD_CHUNK_SIZE
+                if remaining is not None:
+                    size = min(size, remaining)
+                    remaining -= size
+                chunk = await self._run(f.read, size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    async def sha256(self, key: str) -> str:
+        return await self._run(self._sha256, key)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self._delete, [key])
+
+    async def delete_many(self, keys: list[str]) -> None:
+        await self._run(self._delete, keys)
+
+    async def create_multipart_upload(self, key: str) -> str:
+        return await self._run(self._create_multipart_upload)
+
+    async def upload_part(
+        self, key: str, upload_id: str, part_number: int, body: bytes
+    ) -> str:
+        return await self._run(self._upload_part, upload_id, part_number, body)
+
+    async def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: dict[int, str]
+    ) -> None:
+        await self._run(self._complete_multipart_upload, key, upload_id, etags)
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        await self._run(shutil.rmtree, self._upload_dir(upload_id), True)
+
+    def object_url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_from_url(self, url: str) -> str:
+        return key_from_url(url, self.object_url(""))
+
+    def sign(self, *parts: object) -> str:
+        message = "\n".join(map(str, parts)).encode()
+        return hmac.new(self.signing_key, message, "sha256").hexdigest()
+
+    def verify(self, signature: str, expires: int, *parts: object) -> bool:
+        valid = hmac.compare_digest(signature, self.sign(*parts, expires))
+        return valid and expires > time.time()
+
+    def presign(self, key: str) -> str:
+        # Signed per URL window, so URLs are stable within one
+        expires = int(url_window_start().timestamp()) + settings.AWS_PRESIGN_EXPIRY
+        signature = self.sign("GET", key, expires)
+        return f"{self.base_url}/files/{key}?expires={expires}&signature={signature}"
+
+    def presign_many(self, keys: list[str]) -> dict[str, str]:
+        return {key: self.presign(key) for key in keys}
+
+    def presign_post(
+        self, key: str, content_type: str, size: int, sha256: Optional[str] = None
+    ) -> dict[str, Any]:
+        # The file is hashed on finalize: it is on the API's disk, not fetched
+        expires = int(time.time()) + settings.AWS_UPLOAD_URL_EXPIRY
+        fields = {
+            "key": key,
+            "Content-Type": content_type,
+            "size": str(size),
+            "expires": str(expires),
+            "signature": self.sign("POST", key, content_type, size, expires),
+        }
+        return {"url": f"{self.base_url}/files/upload", "fields": fields}
@@ -0,0 +1,60 @@
+from threading import Lock
+from typing import Callable
+
+
+class Counter:
+    def __init__(self) -> None:
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Timer:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict[str, float]:
+        avg = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "total": self.total, "avg": avg, "max": self.max}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._counters: dict[str, Counter] = {}
+        self._timers: dict[str, Timer] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str) -> Counter:
+        return self._counters.setdefault(name, Counter())
+
+    def timer(self, name: str) -> Timer:
+        return self._timers.setdefault(name, Timer())
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        self._gauges[name] = read
+
+    def snapshot(self) -> dict[str, float | dict[str, float]]:
+        data: dict[str, float | dict[str, float]] = {}
+        data.update({name: c.value for name, c in self._counters.items()})
+        data.update({name: t.snapshot() for name, t in self._timers.items()})
+        data.update({name: read() for name, read in self._gauges.items()})
+        return data
+
+
+metrics = Registry()
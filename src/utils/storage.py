@@ -0,0 +1,158 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import IO, Any, AsyncIterator, Callable, Optional, Protocol, TypeVar
+
+from src.config import settings
+from src.utils.metrics import metrics
+
+T = TypeVar("T")
+
+# Objects a pipeline derives from those in a folder: on S3 a Lambda resizes
+# logos, local storage links the originals in their place
+DERIVED_FOLDERS = {"logos": ["resized_logos"]}
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def key_from_url(url: str, base_url: str) -> str:
+    """Key of an object from its stored URL, `<base_url><key>`.
+
+    URLs stored under another base, say before the backend moved, fall back to
+    everything after the host.
+    """
+    if url.startswith(base_url):
+        return url[len(base_url) :]
+    return url.split("/", 3)[3]
+
+
+def url_window_start() -> datetime:
+    """Start of the current presigned URL window.
+
+    Anything signed is still valid for at least AWS_PRESIGN_MARGIN seconds
+    when handed out, so responses carrying signed URLs must be revalidated by
+    the end of the window they were served in.
+    """
+    margin = settings.AWS_PRESIGN_MARGIN
+    return datetime.fromtimestamp(time.time() // margin * margin, timezone.utc)
+
+
+@dataclass
+class ObjectInfo:
+    size: int
+    content_type: Optional[str]
+    etag: str
+    last_modified: datetime
+    # Hex SHA-256 the storage verified on upload, if it was given one
+    sha256: Optional[str] = None
+
+
+class StorageBackend(Protocol):
+    """Where uploaded files are kept, addressed by `<folder>/<name>` keys.
+
+    Transfers are awaitable, URLs are built without any I/O. Clients are
+    handed signed URLs to fetch objects from, and forms to upload them to.
+    """
+
+    async def put_file(
+        self, fileobj: IO[bytes], key: str, content_type: Optional[str] = None
+    ) -> str:
+        ...
+
+    async def copy(self, source_key: str, key: str) -> None:
+        ...
+
+    async def head(self, key: str) -> Optional[ObjectInfo]:
+        ...
+
+    def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Bytes `start` to `end` (inclusive) of an object, chunk by chunk."""
+        ...
+
+    async def sha256(self, key: str) -> str:
+        ...
+
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def delete_many(self, keys: list[str]) -> None:
+        ...
+
+    async def create_multipart_upload(self, key: str) -> str:
+        ...
+
+    async def upload_part(
+        self, key: str, upload_id: str, part_number: int, body: bytes
+    ) -> str:
+        ...
+
+    async def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: dict[int, str]
+    ) -> None:
+        ...
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        ...
+
+    def object_url(self, key: str) -> str:
+        ...
+
+    def key_from_url(self, url: str) -> str:
+        ...
+
+    def presign(self, key: str) -> str:
+        ...
+
+    def presign_many(self, keys: list[str]) -> dict[str, str]:
+        ...
+
+    def presign_post(
+        self, key: str, content_type: str, size: int, sha256: Optional[str] = None
+    ) -> dict[str, Any]:
+        ...
+
+
+class ThreadedBackend:
+    """Runs a backend's blocking calls on a dedicated, bounded thread pool.
+
+    Transfers never queue behind (or starve) the threadpool FastAPI runs sync
+    dependencies in. Running and waiting calls are reported as the
+    `<name>_transfers_in_flight` and `<name>_transfer_queue_depth` gauges.
+    """
+
+    def __init__(self, name: str, workers: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"{name}-transfer"
+        )
+        self._lock = Lock()
+        self.in_flight = 0
+        self.queued = 0
+        metrics.gauge(f"{name}_transfers_in_flight", lambda: self.in_flight)
+        metrics.gauge(f"{name}_transfer_queue_depth", lambda: self.queued)
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        def call() -> T:
+            with self._lock:
+                self.queued -= 1
+                self.in_flight += 1
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+        with self._lock:
+            self.queued += 1
+        future = self._executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            # Cancelled before a worker picked it up, so `call` never ran
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
@@ -1,50 +1,72 @@
+import asyncio
 from datetime import timedelta
+from hashlib import sha256
 from io import BytesIO
-from typing import Callable, Generator
+from typing import AsyncGenerator, Callable, Generator
 
 import pytest
+from anyio.from_thread import BlockingPortal, start_blocking_portal
 from fastapi import UploadFile
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from src.config import settings
 from src.database import get_db
 from src.documents import service as doc_service
 from src.documents.schemas import Document
+from src.logos import service as logo_service
+from src.logos.schemas import Logo
 from src.main import app
 from src.models import Base
+from src.projects import models as proj_models
 from src.projects import service as project_service
 from src.projects.schemas import Project, ProjectCreate
 from src.users.auth import service as auth_service
 from src.users.schemas import User, UserCreate
 from src.utils.auth import create_token
 from src.utils.aws.s3 import S3Client
+from tests.query_counter import QueryCounter
+from tests.samples import DOCUMENT, LOGO
 
 s3 = S3Client()
 
-engine = create_engine(settings.DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Every test runs the app and the fixtures on separate event loops, so
+# connections must not be pooled across them.
+engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
+)
 
-Base.metadata.create_all(bind=engine)
 
+async def create_tables() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
-def override_get_db() -> Generator[Session, None, None]:
-    db = TestingSessionLocal()
-    try:
+
+asyncio.run(create_tables())
+
+
+async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
 
 
+@pytest.fixture(scope="session")
+def portal() -> Generator[BlockingPortal, None, None]:
+    with start_blocking_portal() as portal:
+        yield portal
+
+
 @pytest.fixture(scope="function")
-def db() -> Generator[Session, None, None]:
+def db(portal: BlockingPortal) -> Generator[AsyncSession, None, None]:
     session = TestingSessionLocal()
     yield session
-    session.close()
+    portal.call(session.close)
 
 
 @pytest.fixture(scope="function")
@@ -54,48 +76,59 @@ def client() -> Generator[TestClient, None, None]:
 
 
 @pytest.fixture(scope="function")
-def test_projects(db: Session, test_user: User) -> list[Project]:
+def test_projects(
+    portal: BlockingPortal, db: AsyncSession, test_user: User
+) -> list[Project]:
     projects = [ProjectCreate(name=f"project{i}") for i in range(3)]
-    return [project_service.create(project, test_user.id, db) for project in projects]
+    return [
+        portal.call(project_service.create, project, test_user.id, db)
+        for project in projects
+    ]
 
 
 @pytest.fixture(scope="function", autouse=True)
-def truncate_tables(db: Session) -> None:
-    db.execute(text("SET session_replication_role = replica;"))
-
-    tables_to_truncate = [
-        "users",
-        "projects",
-        "m2m_projects_users",
-        "documents",
-        "logos",
-    ]
-    for table_name in tables_to_truncate:
-        db.execute(text(f"TRUNCATE TABLE {table_name} CASCADE"))
-    db.commit()
+def truncate_tables(portal: BlockingPortal, db: AsyncSession) -> None:
+    async def _truncate() -> None:
+        await db.execute(text("SET session_replication_role = replica;"))
+
+        tables_to_truncate = [
+            "users",
+            "projects",
+            "m2m_projects_users",
+            "documents",
+            "logos",
+            "blobs",
+        ]
+        for table_name in tables_to_truncate:
+            await db.execute(text(f"TRUNCATE TABLE {table_name} CASCADE"))
+        await db.commit()
 
-    db.execute(text("SET session_replication_role = default;"))
+        await db.execute(text("SET session_replication_role = default;"))
+
+    portal.call(_truncate)
 
 
 @pytest.fixture(scope="function")
 def mock_upload_file() -> UploadFile:
-    mock_file = BytesIO(b"file content")
+    mock_file = BytesIO(DOCUMENT)
     mock_file.name = "mock_file.pdf"
     return UploadFile(file=mock_file)
 
 
 @pytest.fixture(scope="function")
 def test_documents(
-    db: Session, test_user: User, test_projects: list[Project]
+    portal: BlockingPortal,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
 ) -> Generator[list[Document], None, None]:
     project = test_projects[0]
     files = [
-        UploadFile(file=BytesIO(b"file content"), filename=f"document{i}")
-        for i in range(3)
+        UploadFile(file=BytesIO(DOCUMENT), filename=f"document{i}") for i in range(3)
     ]
-    documents = [file.filename for file in files if file.filename]
     yield [
-        doc_service.create(
+        portal.call(
+            doc_service.create,
             file,
             project,
             test_user,
@@ -103,16 +136,34 @@ def test_documents(
         )
         for file in files
     ]
-    for doc_name in documents:
-        s3.delete(f"{project.id}_{doc_name}", "documents")
+    s3.delete_key(f"documents/{sha256(DOCUMENT).hexdigest()}")
+
+
+@pytest.fixture(scope="function")
+def test_logo(
+    portal: BlockingPortal,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+) -> Generator[Logo, None, None]:
+    project = portal.call(db.get, proj_models.Project, test_projects[0].id)
+    assert project is not None
+    file = UploadFile(file=BytesIO(LOGO), filename="logo.png")
+    yield portal.call(logo_service.create, file, project, test_user, db)
+    s3.delete_key(f"logos/{sha256(LOGO).hexdigest()}")
+
+
+@pytest.fixture(scope="function")
+def query_counter() -> QueryCounter:
+    return QueryCounter()
 
 
 # USERS:
 @pytest.fixture
-def user_factory(db: Session) -> Callable[..., User]:
+def user_factory(portal: BlockingPortal, db: AsyncSession) -> Callable[..., User]:
     def _create_user(username: str) -> User:
         user_create = UserCreate(username=username, password="12345678")
-        return auth_service.create(user_create, db)
+        return portal.call(auth_service.create, user_create, db)
 
     return _create_user
 
@@ -1,20 +1,41 @@
+import time
+from base64 import b64encode
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
 from io import BytesIO
+from typing import Any, Optional
 
+import httpx
+import pytest
+from anyio.from_thread import BlockingPortal
 from fastapi import UploadFile, status
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import settings
 from src.documents import schemas as doc_schemas
+from src.files import blobs
+from src.files.models import Blob
+from src.files.storage import storage
 from src.projects.schemas import Project
 from src.users.schemas import User
 from src.utils.aws.s3 import S3Client
+from src.utils.storage import ObjectInfo
+from tests.conftest import TestingSessionLocal
+from tests.query_counter import QueryCounter, max_queries
+from tests.samples import DOCUMENT
 
 s3 = S3Client()
 
+# Every fixture and mock document holds these bytes, so they share one blob
+BLOB_KEY = f"documents/{sha256(DOCUMENT).hexdigest()}"
 
+
+@max_queries(4)
 def test_read_project_documents(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_documents: list[doc_schemas.Document],
@@ -33,35 +54,192 @@ def test_read_project_documents(
     assert len(res.json()["documents"]) == len(expected_documents)
 
 
+@max_queries(8)
+def test_read_project_documents_with_cursor(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[doc_schemas.Document],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    first_page = client.get(
+        f"/projects/{project.id}/documents?limit=2", headers=headers
+    ).json()
+    second_page = client.get(
+        f"/projects/{project.id}/documents?limit=2&cursor={first_page['next_cursor']}",
+        headers=headers,
+    ).json()
+
+    ids = [doc["id"] for doc in first_page["documents"] + second_page["documents"]]
+    assert first_page["count"] == len(test_documents)
+    assert second_page["next_cursor"] is None
+    assert sorted(ids) == sorted(str(doc.id) for doc in test_documents)
+
+
+@max_queries(5)
+def test_read_project_documents_is_cached(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[doc_schemas.Document],
+    test_token: str,
+    query_counter: QueryCounter,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/documents"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    first = client.get(url, headers=headers)
+    with query_counter:
+        second = client.get(url, headers=headers)
+
+    assert second.json() == first.json()
+    assert not any("FROM documents" in stmt for stmt in query_counter.statements)
+
+
+@max_queries(12)
+def test_read_project_documents_not_modified(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[doc_schemas.Document],
+    test_token: str,
+    mock_upload_file: UploadFile,
+) -> None:
+    project = test_projects[0]
+    url = f"/projects/{project.id}/documents"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    etag = client.get(url, headers=headers).headers["ETag"]
+    unchanged = client.get(url, headers={**headers, "If-None-Match": etag})
+    client.post(
+        url,
+        headers=headers,
+        files={"file": ("mock_file.pdf", mock_upload_file.file, "application/pdf")},
+    )
+    changed = client.get(url, headers={**headers, "If-None-Match": etag})
+
+    assert unchanged.status_code == 304
+    assert changed.status_code == 200
+    assert changed.json()["count"] == len(test_documents) + 1
+
+
+@max_queries(4)
+def test_document_count_is_project_scoped(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[doc_schemas.Document],
+    test_token: str,
+) -> None:
+    project = test_projects[1]
+
+    res = client.get(
+        f"/projects/{project.id}/documents",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.json()["count"] == 0
+
+
+@max_queries(2)
+def test_read_project_documents_with_invalid_cursor(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+
+    res = client.get(
+        f"/projects/{project.id}/documents?cursor=not-a-cursor",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == 400
+
+
+@max_queries(3)
 def test_upload_document_to_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
     mock_upload_file: UploadFile,
+    query_counter: QueryCounter,
 ) -> None:
     project = test_projects[0]
 
     data = {
         "file": ("mock_file.pdf", mock_upload_file.file, mock_upload_file.content_type)
     }
-    expected_end_of_url = f"documents/{project.id}_mock_file.pdf"
+
+    with query_counter:
+        res = client.post(
+            f"/projects/{project.id}/documents",
+            headers={"MyAuthorization": f"Bearer {test_token}"},
+            files=data,
+        )
+
+    s3.delete_key(BLOB_KEY)
+
+    assert query_counter.commits == 1
+    assert res.json()["url"].endswith(BLOB_KEY)
+    assert (
+        s3.client.list_objects_v2(
+            Bucket=settings.AWS_BUCKET_NAME, Prefix=f"uploads/{project.id}/"
+        ).get("Contents")
+        is None
+    )
+
+
+@max_queries(3)
+def test_upload_large_document_in_parts(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    project = test_projects[0]
+    monkeypatch.setattr(settings, "AWS_UPLOAD_PART_SIZE", 5 * 1024 * 1024)
+    content = b"%PDF-" + bytes(range(256)) * (11 * 1024 * 4)
+    parts: list[int] = []
+    upload_part = storage.upload_part
+
+    async def record_part(key: str, upload_id: str, number: int, body: bytes) -> str:
+        parts.append(number)
+        return await upload_part(key, upload_id, number, body)
+
+    monkeypatch.setattr(storage, "upload_part", record_part)
 
     res = client.post(
         f"/projects/{project.id}/documents",
         headers={"MyAuthorization": f"Bearer {test_token}"},
-        files=data,
+        files={"file": ("large.pdf", BytesIO(content), "application/pdf")},
     )
+    key = f"documents/{sha256(content).hexdigest()}"
+    stored = s3.client.get_object(Bucket=settings.AWS_BUCKET_NAME, Key=key)
+    s3.delete_key(key)
 
-    s3.delete(f"{project.id}_mock_file.pdf", "documents")
-
-    assert res.json()["url"].endswith(expected_end_of_url)
+    assert res.status_code == status.HTTP_201_CREATED
+    assert stored["Body"].read() == content
+    assert sorted(parts) == [1, 2, 3]
 
 
+@max_queries(1)
 def test_upload_unsupported_document_to_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -83,9 +261,73 @@ def test_upload_unsupported_document_to_project(
     assert res.status_code == 422
 
 
+@max_queries(1)
+def test_upload_mislabeled_document_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    project = test_projects[0]
+    parts: list[int] = []
+
+    async def record_part(key: str, upload_id: str, number: int, body: bytes) -> str:
+        parts.append(number)
+        return ""
+
+    monkeypatch.setattr(storage, "upload_part", record_part)
+
+    res = client.post(
+        f"/projects/{project.id}/documents",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+        files={"file": ("fake.pdf", BytesIO(b"MZ" + bytes(8192)), "application/pdf")},
+    )
+
+    assert res.status_code == 422
+    assert parts == []
+
+
+@max_queries(2)
+def test_upload_oversized_document_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    project = test_projects[0]
+    monkeypatch.setitem(settings.UPLOAD_MAX_SIZES, "application/pdf", 1024)
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    # Too large as declared by the request, then as the file streams in
+    declared = client.post(
+        f"/projects/{project.id}/documents",
+        headers=headers,
+        files={"file": ("large.pdf", DOCUMENT + bytes(128 * 1024), "application/pdf")},
+    )
+    streamed = client.post(
+        f"/projects/{project.id}/documents",
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=b"},
+        content=(
+            b"--b\r\nContent-Disposition: form-data; name=file; filename=large.pdf"
+            b"\r\nContent-Type: application/pdf\r\n\r\n"
+            + DOCUMENT
+            + bytes(4096)
+            + b"\r\n--b--\r\n"
+        ),
+    )
+
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+
+
+@max_queries(1)
 def test_download_document(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -100,39 +342,154 @@ def test_download_document(
     )
 
     assert res.status_code == 200
+    assert httpx.get(res.json()["download_url"]).content == DOCUMENT
 
 
+@max_queries(1)
+def test_stream_document_content(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_documents: list[doc_schemas.Document],
+) -> None:
+    document = test_documents[0]
+
+    res = client.get(
+        f"/documents/{document.id}/content",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == 200
+    assert res.content == DOCUMENT
+    assert res.headers["Content-Length"] == str(len(DOCUMENT))
+    assert res.headers["Accept-Ranges"] == "bytes"
+    assert res.headers["ETag"]
+
+
+@max_queries(4)
+def test_stream_document_range(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_documents: list[doc_schemas.Document],
+) -> None:
+    url = f"/documents/{test_documents[0].id}/content"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    res = client.get(url, headers={**headers, "Range": "bytes=9-", "If-Range": etag})
+    assert res.status_code == 206
+    assert res.content == b"file content"
+    assert res.headers["Content-Range"] == "bytes 9-20/21"
+
+    res = client.get(url, headers={**headers, "Range": "bytes=-4"})
+    assert res.status_code == 206
+    assert res.content == b"tent"
+
+    # Changed since the client's copy, so it gets the whole file
+    res = client.get(url, headers={**headers, "Range": "bytes=9-", "If-Range": '"x"'})
+    assert res.status_code == 200
+    assert res.content == DOCUMENT
+
+
+@max_queries(2)
+def test_stream_document_range_if_range_asctime_date(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_documents: list[doc_schemas.Document],
+) -> None:
+    url = f"/documents/{test_documents[0].id}/content"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    last_modified = client.get(url, headers=headers).headers["Last-Modified"]
+    since = time.asctime(parsedate_to_datetime(last_modified).timetuple())
+
+    res = client.get(url, headers={**headers, "Range": "bytes=9-", "If-Range": since})
+
+    assert res.status_code == 206
+    assert res.content == b"file content"
+
+
+@max_queries(3)
+def test_stream_document_unsatisfiable_range(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_documents: list[doc_schemas.Document],
+) -> None:
+    url = f"/documents/{test_documents[0].id}/content"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    res = client.get(url, headers={**headers, "Range": "bytes=21-"})
+    assert res.status_code == 416
+    assert res.headers["Content-Range"] == "bytes */21"
+
+    etag = client.get(url, headers=headers).headers["ETag"]
+    res = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+
+
+@max_queries(5)
+def test_listing_reuses_signed_urls(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[doc_schemas.Document],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    listing = client.get(f"/projects/{project.id}/documents", headers=headers).json()
+    single = client.get(f"/documents/{test_documents[0].id}/", headers=headers).json()
+
+    urls = {doc["id"]: doc["download_url"] for doc in listing["documents"]}
+    assert "Signature=" in single["download_url"]
+    assert urls[str(test_documents[0].id)] == single["download_url"]
+
+
+@max_queries(5)
 def test_update_document(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
     mock_upload_file: UploadFile,
     test_documents: list[doc_schemas.Document],
+    query_counter: QueryCounter,
 ) -> None:
-    project = test_projects[0]
     document = test_documents[0]
 
     data = {
         "file": ("mock_file.pdf", mock_upload_file.file, mock_upload_file.content_type)
     }
-    expected_end_of_url = f"documents/{project.id}_mock_file.pdf"
 
-    res = client.put(
-        f"/documents/{document.id}/",
-        headers={"MyAuthorization": f"Bearer {test_token}"},
-        files=data,
-    )
-
-    s3.delete(f"{project.id}_mock_file.pdf", "documents")
+    with query_counter:
+        res = client.put(
+            f"/documents/{document.id}/",
+            headers={"MyAuthorization": f"Bearer {test_token}"},
+            files=data,
+        )
 
-    assert res.json()["url"].endswith(expected_end_of_url)
+    assert query_counter.commits == 1
+    assert res.json()["url"].endswith(BLOB_KEY)
+    assert res.json()["name"] == "mock_file.pdf"
 
 
+@max_queries(4)
 def test_delete_document(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -146,3 +503,296 @@ def test_delete_document(
     )
 
     assert res.status_code == status.HTTP_204_NO_CONTENT
+
+
+@max_queries(4)
+def test_direct_upload_document(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    content = b"%PDF-direct upload content"
+
+    presigned = client.post(
+        f"/projects/{project.id}/documents/upload-url",
+        json={
+            "name": "direct.pdf",
+            "content_type": "application/pdf",
+            "size": len(content),
+        },
+        headers=headers,
+    ).json()
+    uploaded = httpx.post(
+        presigned["url"],
+        data=presigned["fields"],
+        files={"file": ("direct.pdf", content, "application/pdf")},
+    )
+    res = client.post(
+        f"/projects/{project.id}/documents/finalize",
+        json={"name": "direct.pdf", "key": presigned["key"]},
+        headers=headers,
+    )
+    key = f"documents/{sha256(content).hexdigest()}"
+    s3.delete_key(key)
+
+    assert presigned["key"].startswith(f"uploads/{project.id}/")
+    assert uploaded.is_success
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["url"].endswith(key)
+    assert s3.head(presigned["key"]) is None
+
+
+@max_queries(5)
+def test_direct_upload_hashed_by_storage(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    content = b"%PDF-hashed by storage"
+    digest = sha256(content).hexdigest()
+    head = storage.head
+
+    # The S3 stand-in neither verifies nor returns checksums, as S3 does
+    async def verified_head(key: str) -> Optional[ObjectInfo]:
+        info = await head(key)
+        if info is not None:
+            info.sha256 = digest
+        return info
+
+    async def read_back(key: str) -> str:
+        raise AssertionError("The upload was read back to be hashed")
+
+    monkeypatch.setattr(storage, "head", verified_head)
+    monkeypatch.setattr(storage, "sha256", read_back)
+
+    presigned = client.post(
+        f"/projects/{project.id}/documents/upload-url",
+        json={
+            "name": "direct.pdf",
+            "content_type": "application/pdf",
+            "size": len(content),
+            "sha256": digest,
+        },
+        headers=headers,
+    ).json()
+    httpx.post(
+        presigned["url"],
+        data=presigned["fields"],
+        files={"file": ("direct.pdf", content, "application/pdf")},
+    )
+    res = client.post(
+        f"/projects/{project.id}/documents/finalize",
+        json={"name": "direct.pdf", "key": presigned["key"]},
+        headers=headers,
+    )
+    s3.delete_key(f"documents/{digest}")
+
+    checksum = b64encode(bytes.fromhex(digest)).decode()
+    assert presigned["fields"]["x-amz-checksum-sha256"] == checksum
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["url"].endswith(f"documents/{digest}")
+
+
+@max_queries(1)
+def test_presign_oversized_document(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    res = client.post(
+        f"/projects/{test_projects[0].id}/documents/upload-url",
+        json={
+            "name": "huge.pdf",
+            "content_type": "application/pdf",
+            "size": settings.AWS_UPLOAD_MAX_SIZE + 1,
+        },
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@max_queries(1)
+def test_finalize_missing_upload(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    res = client.post(
+        f"/projects/{test_projects[0].id}/documents/finalize",
+        json={"name": "missing.pdf"},
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+@max_queries(15)
+def test_same_bytes_are_stored_once(
+    portal: BlockingPortal,
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    documents = [
+        client.post(
+            f"/projects/{project.id}/documents",
+            headers=headers,
+            files={"file": ("template.pdf", BytesIO(DOCUMENT), "application/pdf")},
+        ).json()
+        for project in test_projects[:2]
+    ]
+
+    client.delete(f"/documents/{documents[0]['id']}", headers=headers)
+    still_referenced = s3.head(BLOB_KEY)
+    client.delete(f"/documents/{documents[1]['id']}", headers=headers)
+    unreferenced = s3.head(BLOB_KEY)
+    swept = portal.call(blobs.sweep, db, 10)
+
+    assert documents[0]["url"] == documents[1]["url"]
+    assert documents[0]["url"].endswith(BLOB_KEY)
+    assert still_referenced is not None
+    assert unreferenced is not None
+    assert swept == 1
+    assert s3.head(BLOB_KEY) is None
+
+
+def test_upload_revives_unreferenced_blob(
+    portal: BlockingPortal,
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/documents"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    files = {"file": ("template.pdf", DOCUMENT, "application/pdf")}
+
+    first = client.post(url, headers=headers, files=files).json()
+    client.delete(f"/documents/{first['id']}", headers=headers)
+    second = client.post(url, headers=headers, files=files).json()
+    swept = portal.call(blobs.sweep, db, 10)
+    blob = portal.call(db.scalar, select(Blob).where(Blob.key == BLOB_KEY))
+
+    s3.delete_key(BLOB_KEY)
+
+    assert swept == 0
+    assert blob is not None and blob.ref_count == 1
+    assert second["url"] == first["url"]
+
+
+def test_upload_rewrites_blob_swept_meanwhile(
+    client: TestClient,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/documents"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    files = {"file": ("template.pdf", DOCUMENT, "application/pdf")}
+    acquire = blobs.acquire
+
+    async def acquire_after_sweep(*args: Any) -> Blob:
+        # The object is written, the sweep removes it before the row is taken
+        async with TestingSessionLocal() as sweep_db:
+            await blobs.sweep(sweep_db, 10)
+        return await acquire(*args)
+
+    first = client.post(url, headers=headers, files=files).json()
+    client.delete(f"/documents/{first['id']}", headers=headers)
+    monkeypatch.setattr(blobs, "acquire", acquire_after_sweep)
+    second = client.post(url, headers=headers, files=files)
+    stored = s3.head(BLOB_KEY)
+
+    s3.delete_key(BLOB_KEY)
+
+    assert second.status_code == status.HTTP_201_CREATED
+    assert stored is not None
+
+
+@max_queries(8)
+def test_declared_hash_skips_upload(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[1]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+    upload = {"name": "copy.pdf", "sha256": BLOB_KEY.split("/")[1]}
+    client.post(
+        f"/projects/{test_projects[0].id}/documents",
+        headers=headers,
+        files={"file": ("original.pdf", BytesIO(DOCUMENT), "application/pdf")},
+    )
+
+    presigned = client.post(
+        f"/projects/{project.id}/documents/upload-url",
+        json={**upload, "content_type": "application/pdf", "size": len(DOCUMENT)},
+        headers=headers,
+    ).json()
+    res = client.post(
+        f"/projects/{project.id}/documents/finalize", json=upload, headers=headers
+    )
+
+    s3.delete_key(BLOB_KEY)
+
+    assert presigned["url"] is None
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["url"].endswith(BLOB_KEY)
+
+
+@max_queries(3)
+def test_finalize_with_wrong_hash(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    presigned = client.post(
+        f"/projects/{project.id}/documents/upload-url",
+        json={
+            "name": "direct.pdf",
+            "content_type": "application/pdf",
+            "size": len(DOCUMENT),
+        },
+        headers=headers,
+    ).json()
+    uploaded = httpx.post(
+        presigned["url"],
+        data=presigned["fields"],
+        files={"file": ("direct.pdf", DOCUMENT, "application/pdf")},
+    )
+    res = client.post(
+        f"/projects/{project.id}/documents/finalize",
+        json={"name": "direct.pdf", "key": presigned["key"], "sha256": "0" * 64},
+        headers=headers,
+    )
+
+    assert uploaded.is_success
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert res.json()["detail"] == "Checksum mismatch"
+    assert s3.head(presigned["key"]) is None
@@ -0,0 +1,259 @@
+from hashlib import sha256
+from io import BytesIO
+from typing import Generator
+
+import httpx
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.logos import schemas as logo_schemas
+from src.projects.schemas import Project
+from src.users.schemas import User
+from src.utils.aws.s3 import S3Client
+from tests.query_counter import QueryCounter, max_queries
+from tests.samples import LOGO, jpeg, png
+
+s3 = S3Client()
+
+LOGO_HASH = sha256(LOGO).hexdigest()
+NEW_LOGO = png(128, 128, b"new logo content")
+
+
+@max_queries(4)
+def test_upload_logo_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    query_counter: QueryCounter,
+) -> None:
+    project = test_projects[0]
+
+    data = {"file": ("logo.png", BytesIO(LOGO), "image/png")}
+
+    with query_counter:
+        res = client.post(
+            f"/projects/{project.id}/logo",
+            headers={"MyAuthorization": f"Bearer {test_token}"},
+            files=data,
+        )
+
+    s3.delete_key(f"logos/{LOGO_HASH}")
+
+    assert query_counter.commits == 1
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["url"].endswith(f"resized_logos/{LOGO_HASH}")
+
+
+@max_queries(3)
+def test_upload_logo_bomb_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/logo"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    # A few bytes on the wire, gigabytes once decoded
+    files = [
+        ("logo.png", png(100_000, 100_000), "image/png"),
+        ("logo.jpg", jpeg(60_000, 60_000), "image/jpeg"),
+        ("logo.png", b"<svg></svg>", "image/png"),
+    ]
+    responses = [
+        client.post(url, headers=headers, files={"file": file}) for file in files
+    ]
+
+    assert [res.status_code for res in responses] == [422, 422, 422]
+
+
+@max_queries(1)
+def test_upload_oversized_logo_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setitem(settings.UPLOAD_MAX_SIZES, "image/png", 1024)
+
+    res = client.post(
+        f"/projects/{test_projects[0].id}/logo",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+        files={"file": ("logo.png", png(64, 64, bytes(128 * 1024)), "image/png")},
+    )
+
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@max_queries(1)
+def test_download_logo(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_logo: logo_schemas.Logo,
+) -> None:
+    project = test_projects[0]
+
+    res = client.get(
+        f"/projects/{project.id}/logo",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.json()["id"] == str(test_logo.id)
+
+
+@max_queries(1)
+def test_download_missing_logo(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+
+    res = client.get(
+        f"/projects/{project.id}/logo",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.fixture(scope="function")
+def resized_logo(test_logo: logo_schemas.Logo) -> Generator[str, None, None]:
+    # Nothing resizes logos here, the original stands in for the Lambda's copy
+    key = f"resized_logos/{LOGO_HASH}"
+    s3.copy(f"logos/{LOGO_HASH}", key)
+    yield key
+    s3.delete_key(key)
+
+
+@max_queries(1)
+def test_stream_logo_content(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    resized_logo: str,
+) -> None:
+    res = client.get(
+        f"/projects/{test_projects[0].id}/logo/content",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == 200
+    assert res.content == LOGO
+    assert res.headers["Content-Length"] == str(len(LOGO))
+    assert res.headers["Accept-Ranges"] == "bytes"
+
+
+@max_queries(2)
+def test_stream_logo_range(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    resized_logo: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/logo/content"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    res = client.get(url, headers={**headers, "Range": "bytes=0-7"})
+    suffix = client.get(url, headers={**headers, "Range": "bytes=-12"})
+
+    assert res.status_code == 206
+    assert res.content == LOGO[:8]
+    assert res.headers["Content-Range"] == f"bytes 0-7/{len(LOGO)}"
+    assert suffix.status_code == 206
+    assert suffix.content == b"logo content"
+
+
+@max_queries(5)
+def test_update_logo(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_logo: logo_schemas.Logo,
+    query_counter: QueryCounter,
+) -> None:
+    project = test_projects[0]
+
+    data = {"file": ("new_logo.png", BytesIO(NEW_LOGO), "image/png")}
+
+    with query_counter:
+        res = client.put(
+            f"/projects/{project.id}/logo",
+            headers={"MyAuthorization": f"Bearer {test_token}"},
+            files=data,
+        )
+
+    s3.delete_key(f"logos/{sha256(NEW_LOGO).hexdigest()}")
+
+    assert query_counter.commits == 1
+    assert res.json()["name"] == "new_logo.png"
+
+
+@max_queries(4)
+def test_delete_logo(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    test_logo: logo_schemas.Logo,
+) -> None:
+    project = test_projects[0]
+
+    res = client.delete(
+        f"/projects/{project.id}/logo",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+
+
+@max_queries(5)
+def test_direct_upload_logo(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    presigned = client.post(
+        f"/projects/{project.id}/logo/upload-url",
+        json={"name": "logo.png", "content_type": "image/png", "size": len(LOGO)},
+        headers=headers,
+    ).json()
+    httpx.post(
+        presigned["url"],
+        data=presigned["fields"],
+        files={"file": ("logo.png", LOGO, "image/png")},
+    )
+    res = client.post(
+        f"/projects/{project.id}/logo/finalize",
+        json={"name": "logo.png", "key": presigned["key"]},
+        headers=headers,
+    )
+    s3.delete_key(f"logos/{LOGO_HASH}")
+
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["url"].endswith(f"resized_logos/{LOGO_HASH}")
@@ -1,13 +1,25 @@
+from hashlib import sha256
+
+from anyio.from_thread import BlockingPortal
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.documents.schemas import Document
+from src.files import blobs
+from src.logos.schemas import Logo
 from src.projects.schemas import Project
 from src.users.schemas import User
+from src.utils.aws.s3 import S3Client
+from tests.query_counter import QueryCounter, max_queries
+from tests.samples import DOCUMENT, LOGO
+
+s3 = S3Client()
 
 
+@max_queries(2)
 def test_read_projects(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -15,11 +27,62 @@ def test_read_projects(
     res = client.get("/projects/", headers={"MyAuthorization": f"Bearer {test_token}"})
 
     assert res.status_code == 200
+    assert res.json()["next_cursor"] is None
+    assert sorted(proj["id"] for proj in res.json()["projects"]) == sorted(
+        str(project.id) for project in test_projects
+    )
+
+
+@max_queries(3)
+def test_read_projects_with_cursor(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    first_page = client.get("/projects/?limit=2", headers=headers).json()
+    second_page = client.get(
+        f"/projects/?limit=2&cursor={first_page['next_cursor']}", headers=headers
+    ).json()
+
+    ids = [proj["id"] for proj in first_page["projects"] + second_page["projects"]]
+    assert second_page["next_cursor"] is None
+    assert sorted(ids) == sorted(str(project.id) for project in test_projects)
+
+
+@max_queries(2)
+def test_read_projects_with_stats(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[Document],
+    test_logo: Logo,
+    test_token: str,
+) -> None:
+    res = client.get(
+        "/projects/?include_stats=true",
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    stats = {
+        proj["id"]: (proj["document_count"], proj["logo_url"])
+        for proj in res.json()["projects"]
+    }
+    assert stats == {
+        str(test_projects[0].id): (len(test_documents), test_logo.url),
+        str(test_projects[1].id): (0, None),
+        str(test_projects[2].id): (0, None),
+    }
 
 
+@max_queries(1)
 def test_read_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -40,6 +103,124 @@ def test_read_project(
     }
 
 
+@max_queries(3)
+def test_read_project_not_modified(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/info"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    first = client.get(url, headers=headers)
+    by_etag = client.get(
+        url, headers={**headers, "If-None-Match": first.headers["ETag"]}
+    )
+    by_date = client.get(
+        url, headers={**headers, "If-Modified-Since": first.headers["Last-Modified"]}
+    )
+
+    assert by_etag.status_code == 304 and by_etag.content == b""
+    assert by_etag.headers["ETag"] == first.headers["ETag"]
+    assert by_date.status_code == 304
+
+
+@max_queries(2)
+def test_read_project_not_modified_weak_etag(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/info"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    etag = client.get(url, headers=headers).headers["ETag"]
+    res = client.get(url, headers={**headers, "If-None-Match": f'W/"other", W/{etag}'})
+
+    assert res.status_code == 304
+
+
+@max_queries(2)
+def test_read_project_modified_since_asctime_date(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/info"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    # Both parse without a timezone, which HTTP dates are always in
+    responses = [
+        client.get(url, headers={**headers, "If-Modified-Since": since})
+        for since in ["Sun Oct 18 12:00:00 2099", "Sun, 18 Oct 2099 12:00:00 -0000"]
+    ]
+
+    assert [res.status_code for res in responses] == [304, 304]
+
+
+@max_queries(6)
+def test_update_project_changes_etag(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/info"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    etag = client.get(url, headers=headers).headers["ETag"]
+    client.put(url, json={"name": "updated_project"}, headers=headers)
+    res = client.get(url, headers={**headers, "If-None-Match": etag})
+
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+
+@max_queries(2)
+def test_known_membership_skips_membership_join(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    query_counter: QueryCounter,
+) -> None:
+    url = f"/projects/{test_projects[0].id}/info"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    client.get(url, headers=headers)
+    with query_counter:
+        res = client.get(url, headers=headers)
+
+    assert res.status_code == 200
+    assert "m2m_projects_users" not in query_counter.statements[0]
+
+
+@max_queries(5)
+def test_deleted_project_is_not_served_from_membership_cache(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+) -> None:
+    url = f"/projects/{test_projects[0].id}"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    client.delete(url, headers=headers)
+    res = client.get(f"{url}/info", headers=headers)
+
+    assert res.status_code == 403
+
+
+@max_queries(1)
 def test_read_nonexistent_project(
     client: TestClient,
     test_user: User,
@@ -53,9 +234,10 @@ def test_read_nonexistent_project(
     assert res.status_code == 403
 
 
+@max_queries(1)
 def test_unauthorized_project_access(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     unauthorized_token: str,
@@ -70,45 +252,54 @@ def test_unauthorized_project_access(
     assert res.status_code == 403
 
 
+@max_queries(3)
 def test_create_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_token: str,
+    query_counter: QueryCounter,
 ) -> None:
     data = {"name": "project9999"}
 
-    res = client.post(
-        "/projects/", json=data, headers={"MyAuthorization": f"Bearer {test_token}"}
-    )
+    with query_counter:
+        res = client.post(
+            "/projects/", json=data, headers={"MyAuthorization": f"Bearer {test_token}"}
+        )
 
+    assert query_counter.commits == 1
     assert res.json()["name"] == data["name"] and res.json()["owner_id"] == str(
         test_user.id
     )
 
 
+@max_queries(2)
 def test_update_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
+    query_counter: QueryCounter,
 ) -> None:
     project = test_projects[0]
     data = {"name": "updated_project"}
 
-    res = client.put(
-        f"/projects/{project.id}/info",
-        json=data,
-        headers={"MyAuthorization": f"Bearer {test_token}"},
-    )
+    with query_counter:
+        res = client.put(
+            f"/projects/{project.id}/info",
+            json=data,
+            headers={"MyAuthorization": f"Bearer {test_token}"},
+        )
 
+    assert query_counter.commits == 1
     assert res.json()["name"] == data["name"]
 
 
+@max_queries(1)
 def test_update_nonexistent_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_token: str,
 ) -> None:
@@ -123,9 +314,10 @@ def test_update_nonexistent_project(
     assert res.status_code == 403
 
 
+@max_queries(4)
 def test_delete_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -139,9 +331,36 @@ def test_delete_project(
     assert res.status_code == 204
 
 
+@max_queries(8)
+def test_delete_project_with_documents_and_logo(
+    portal: BlockingPortal,
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_documents: list[Document],
+    test_logo: Logo,
+    test_token: str,
+) -> None:
+    project = test_projects[0]
+
+    res = client.delete(
+        f"/projects/{project.id}", headers={"MyAuthorization": f"Bearer {test_token}"}
+    )
+
+    swept = portal.call(blobs.sweep, db, 10)
+
+    # The documents share one blob, released once per document
+    assert res.status_code == 204
+    assert swept == 2
+    assert s3.head(f"documents/{sha256(DOCUMENT).hexdigest()}") is None
+    assert s3.head(f"logos/{sha256(LOGO).hexdigest()}") is None
+
+
+@max_queries(1)
 def test_delete_nonexistent_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_token: str,
 ) -> None:
@@ -150,12 +369,13 @@ def test_delete_nonexistent_project(
         headers={"MyAuthorization": f"Bearer {test_token}"},
     )
 
-    assert res.status_code == 404
+    assert res.status_code == 403
 
 
+@max_queries(1)
 def test_user_cannot_delete_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     participant_token: str,
@@ -170,9 +390,10 @@ def test_user_cannot_delete_project(
     assert res.status_code == 403
 
 
+@max_queries(3)
 def test_invite_to_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     test_token: str,
@@ -188,9 +409,10 @@ def test_invite_to_project(
     assert res.status_code == 201
 
 
+@max_queries(1)
 def test_user_cannot_invite_to_project(
     client: TestClient,
-    db: Session,
+    db: AsyncSession,
     test_user: User,
     test_projects: list[Project],
     participant_token: str,
@@ -204,3 +426,74 @@ def test_user_cannot_invite_to_project(
     )
 
     assert res.status_code == 403
+
+
+@max_queries(6)
+def test_invite_is_idempotent(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    invited_user: User,
+) -> None:
+    project = test_projects[0]
+    url = f"/projects/{project.id}/invite?user={invited_user.username}"
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    client.post(url, headers=headers)
+    res = client.post(url, headers=headers)
+
+    assert res.status_code == 201
+
+
+@max_queries(3)
+def test_bulk_invite_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    test_token: str,
+    invited_user: User,
+) -> None:
+    project = test_projects[0]
+
+    res = client.post(
+        f"/projects/{project.id}/invite/bulk",
+        json={
+            "usernames": [
+                invited_user.username,
+                test_user.username,
+                "nobody",
+                invited_user.username,
+            ]
+        },
+        headers={"MyAuthorization": f"Bearer {test_token}"},
+    )
+
+    assert res.status_code == 200
+    assert res.json() == [
+        {"username": invited_user.username, "status": "invited"},
+        {"username": test_user.username, "status": "already_member"},
+        {"username": "nobody", "status": "not_found"},
+    ]
+
+
+@max_queries(1)
+def test_user_cannot_bulk_invite_to_project(
+    client: TestClient,
+    db: AsyncSession,
+    test_user: User,
+    test_projects: list[Project],
+    participant_token: str,
+    invited_user: User,
+) -> None:
+    project = test_projects[0]
+
+    res = client.post(
+        f"/projects/{project.id}/invite/bulk",
+        json={"usernames": [invited_user.username]},
+        headers={"MyAuthorization": f"Bearer {participant_token}"},
+    )
+
+    assert res.status_code == 403
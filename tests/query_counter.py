@@ -0,0 +1,62 @@
+import functools
+from types import TracebackType
+from typing import Any, Callable, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class QueryCounter:
+    """Records every SQL statement and commit sent to the database while active."""
+
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, *args: Any) -> None:
+        # before_cursor_execute(conn, cursor, statement, parameters, ...)
+        self.statements.append(args[2])
+
+    def _record_commit(self, *args: Any) -> None:
+        self.commits += 1
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements.clear()
+        self.commits = 0
+        event.listen(Engine, "before_cursor_execute", self._record)
+        event.listen(Engine, "commit", self._record_commit)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        event.remove(Engine, "before_cursor_execute", self._record)
+        event.remove(Engine, "commit", self._record_commit)
+
+
+def max_queries(limit: int) -> Callable[[F], F]:
+    """Fail the decorated test if its body runs more than `limit` statements."""
+
+    def decorator(test: F) -> F:
+        @functools.wraps(test)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with QueryCounter() as counter:
+                result = test(*args, **kwargs)
+            assert counter.count <= limit, (
+                f"{counter.count} queries exceeded the budget of {limit}:\n"
+                + "\n".join(counter.statements)
+            )
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,21 @@
+import struct
+import zlib
+
+
+def png(width: int, height: int, body: bytes = b"") -> bytes:
+    """PNG signature and header chunk, the rest of the image left out."""
+    ihdr = b"IHDR" + struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    chunk = struct.pack(">I", 13) + ihdr + struct.pack(">I", zlib.crc32(ihdr))
+    return b"\x89PNG\r\n\x1a\n" + chunk + body
+
+
+def jpeg(width: int, height: int, body: bytes = b"") -> bytes:
+    """JPEG with an APP0 segment and a start of frame, without scan data."""
+    app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof + body
+
+
+# Every fixture and mock file holds these bytes, so they share one blob
+DOCUMENT = b"%PDF-1.4 file content"
+LOGO = png(64, 64, b"logo content")
@@ -0,0 +1,75 @@
+import time
+from uuid import uuid4
+
+from anyio.from_thread import BlockingPortal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.projects.membership import InMemoryMembershipBackend
+from src.users import models as user_models
+from src.users.dependencies import get_token_user, token_cache
+from src.users.schemas import User
+from src.utils.cache import TTLCache
+
+
+def test_evicts_least_recently_used() -> None:
+    cache: TTLCache[str, int] = TTLCache("test_lru", maxsize=2)
+    expires_at = time.time() + 60
+    cache.set("a", 1, expires_at)
+    cache.set("b", 2, expires_at)
+
+    cache.get("a")
+    cache.set("c", 3, expires_at)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_expired_entries_are_misses() -> None:
+    cache: TTLCache[str, int] = TTLCache("test_ttl", maxsize=2)
+    cache.set("a", 1, time.time() - 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.misses.value == 1
+
+
+def test_discard_where() -> None:
+    cache: TTLCache[str, int] = TTLCache("test_discard", maxsize=3)
+    expires_at = time.time() + 60
+    for key, value in {"a": 1, "b": 2, "c": 3}.items():
+        cache.set(key, value, expires_at)
+
+    cache.discard_where(lambda _, value: value % 2 == 1)
+
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+
+def test_user_update_invalidates_cached_token(
+    portal: BlockingPortal, db: AsyncSession, test_user: User, test_token: str
+) -> None:
+    cached = portal.call(get_token_user, test_token)
+    assert portal.call(get_token_user, test_token) is cached
+
+    async def _rename() -> None:
+        user = await db.get(user_models.User, test_user.id)
+        assert user is not None
+        user.username = "renamed"
+        await db.commit()
+
+    portal.call(_rename)
+
+    assert token_cache.get(test_token) is None
+
+
+def test_discard_project_drops_its_memberships(portal: BlockingPortal) -> None:
+    backend = InMemoryMembershipBackend(maxsize=10, ttl=60)
+    user_id, project_id, other_project_id = uuid4(), uuid4(), uuid4()
+    portal.call(backend.add, user_id, project_id)
+    portal.call(backend.add, user_id, other_project_id)
+
+    portal.call(backend.discard_project, project_id)
+
+    assert not portal.call(backend.contains, user_id, project_id)
+    assert portal.call(backend.contains, user_id, other_project_id)
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+from anyio.from_thread import BlockingPortal
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import cli
+from src.documents import models as doc_models
+from src.documents.schemas import Document
+from src.files.models import Blob
+from src.models import ProjectUser
+from src.projects import models as proj_models
+from src.projects.schemas import Project
+from src.users import models as user_models
+from src.utils.auth import verify_password
+
+
+def test_import_users_hashes_plain_passwords(
+    portal: BlockingPortal, db: AsyncSession, tmp_path: Path
+) -> None:
+    path = tmp_path / "users.csv"
+    path.write_text("username,password\nalice,alice-secret\nbob,bob-secret\n")
+
+    cli.main(["import", "users", str(path), "--workers", "2"])
+
+    users = portal.call(db.scalars, select(user_models.User))
+    passwords = {user.username: user.password_hash for user in users}
+    assert passwords.keys() == {"alice", "bob"}
+    assert verify_password("alice-secret", passwords["alice"])
+    assert verify_password("bob-secret", passwords["bob"])
+
+
+def test_import_fills_empty_timestamps(
+    portal: BlockingPortal, db: AsyncSession, tmp_path: Path
+) -> None:
+    path = tmp_path / "users.csv"
+    path.write_text("id,username,password,created_at,updated_at\n,alice,secret,,\n")
+
+    cli.main(["import", "users", str(path)])
+
+    user = portal.call(db.scalar, select(user_models.User))
+    assert user is not None
+    assert user.created_at is not None
+    assert user.updated_at is not None
+
+
+def test_export_then_import_round_trips(
+    portal: BlockingPortal,
+    db: AsyncSession,
+    test_projects: list[Project],
+    test_documents: list[Document],
+    tmp_path: Path,
+) -> None:
+    tables = ["users", "blobs", "projects", "m2m_projects_users", "documents"]
+    formats = ["csv", "ndjson", "ndjson", "csv", "csv"]
+    for table, fmt in zip(tables, formats):
+        cli.main(["export", table, str(tmp_path / f"{table}.{fmt}")])
+
+    async def _truncate() -> None:
+        await db.execute(text(f"TRUNCATE {', '.join(tables)} CASCADE"))
+        await db.commit()
+
+    portal.call(_truncate)
+    for table, fmt in zip(tables, formats):
+        cli.main(["import", table, str(tmp_path / f"{table}.{fmt}")])
+
+    projects = portal.call(db.scalars, select(proj_models.Project))
+    assert sorted((proj.id, proj.name) for proj in projects) == sorted(
+        (proj.id, proj.name) for proj in test_projects
+    )
+    memberships = portal.call(db.scalar, select(func.count()).select_from(ProjectUser))
+    assert memberships == len(test_projects)
+    documents = list(portal.call(db.scalars, select(doc_models.Document)))
+    assert sorted((doc.id, doc.url) for doc in documents) == sorted(
+        (doc.id, doc.url) for doc in test_documents
+    )
+    # The documents hold the same bytes
+    assert {doc.blob_id for doc in documents} == set(
+        portal.call(db.scalars, select(Blob.id))
+    )
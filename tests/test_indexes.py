@@ -0,0 +1,34 @@
+from uuid import uuid4
+
+import pytest
+from anyio.from_thread import BlockingPortal
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PLANS = [
+    (
+        "SELECT * FROM documents WHERE project_id = :id ORDER BY created_at, id",
+        "ix_documents_project_id_created_at_id",
+    ),
+    (
+        "SELECT 1 FROM m2m_projects_users WHERE project_id = :id",
+        "ix_m2m_projects_users_project_id",
+    ),
+    ("SELECT * FROM projects WHERE owner_id = :id", "ix_projects_owner_id"),
+    ("SELECT * FROM projects WHERE logo_id = :id", "ix_projects_logo_id"),
+]
+
+
+@pytest.mark.parametrize(("query", "index"), PLANS)
+def test_query_plan_uses_index(
+    portal: BlockingPortal, db: AsyncSession, query: str, index: str
+) -> None:
+    async def _explain() -> str:
+        # The test tables are tiny, so force the planner off sequential scans
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        res = await db.execute(text(f"EXPLAIN {query}"), {"id": uuid4()})
+        plan = "\n".join(res.scalars())
+        await db.rollback()
+        return plan
+
+    assert index in portal.call(_explain)
@@ -0,0 +1,9 @@
+from fastapi.testclient import TestClient
+
+
+def test_read_metrics_reports_pool(client: TestClient) -> None:
+    res = client.get("/metrics")
+
+    assert res.status_code == 200
+    assert res.json()["db_pool_checkout_wait_seconds"]["count"] > 0
+    assert "db_pool_checked_out" in res.json()
@@ -0,0 +1,80 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import database
+from src.projects.schemas import Project
+from tests.conftest import TestingSessionLocal
+
+
+class ReplicaSpy:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, **kwargs: Any) -> AsyncSession:
+        self.calls += 1
+        return TestingSessionLocal(**kwargs)
+
+
+@pytest.fixture(scope="function")
+def replica(monkeypatch: pytest.MonkeyPatch) -> ReplicaSpy:
+    spy = ReplicaSpy()
+    monkeypatch.setattr(database, "ReplicaSessionLocal", spy)
+    return spy
+
+
+def test_reads_go_to_replica(
+    client: TestClient,
+    test_projects: list[Project],
+    test_token: str,
+    replica: ReplicaSpy,
+) -> None:
+    res = client.get("/projects/", headers={"MyAuthorization": f"Bearer {test_token}"})
+
+    assert res.status_code == 200
+    assert replica.calls == 1
+
+
+def test_reads_after_write_stay_on_primary(
+    client: TestClient,
+    test_projects: list[Project],
+    test_token: str,
+    replica: ReplicaSpy,
+) -> None:
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    created = client.post("/projects/", json={"name": "fresh"}, headers=headers)
+    res = client.get(f"/projects/{created.json()['id']}/info", headers=headers)
+
+    assert database.READ_PRIMARY_COOKIE in created.cookies
+    assert res.status_code == 200
+    assert replica.calls == 0
+
+
+def test_signup_marks_read_primary(client: TestClient, replica: ReplicaSpy) -> None:
+    created = client.post("/auth", json={"username": "fresh", "password": "12345678"})
+
+    assert created.status_code == 201
+    assert database.READ_PRIMARY_COOKIE in created.cookies
+    assert database.READ_PRIMARY_HEADER in created.headers
+
+
+def test_read_primary_header_without_cookies(
+    client: TestClient,
+    test_projects: list[Project],
+    test_token: str,
+    replica: ReplicaSpy,
+) -> None:
+    headers = {"MyAuthorization": f"Bearer {test_token}"}
+
+    created = client.post("/projects/", json={"name": "fresh"}, headers=headers)
+    client.cookies.clear()
+    headers[database.READ_PRIMARY_HEADER] = created.headers[
+        database.READ_PRIMARY_HEADER
+    ]
+    res = client.get(f"/projects/{created.json()['id']}/info", headers=headers)
+
+    assert res.status_code == 200
+    assert replica.calls == 0
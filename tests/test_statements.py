@@ -0,0 +1,34 @@
+from timeit import timeit
+from typing import Any, Callable
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import Select, select
+
+from src.users import models as user_models
+from src.users.dependencies import user_by_id, user_by_username
+
+ROUNDS = 1000
+
+# Per-request work SQLAlchemy does before it can reuse a compiled statement:
+# build the construct (when it isn't prebuilt) and derive its cache key.
+CASES = [
+    (
+        lambda: select(user_models.User).where(user_models.User.id == uuid4()),
+        user_by_id,
+    ),
+    (
+        lambda: select(user_models.User).where(user_models.User.username == "user"),
+        user_by_username,
+    ),
+]
+
+
+@pytest.mark.parametrize(("build", "prebuilt"), CASES)
+def test_prebuilt_statement_is_cheaper_than_rebuilding(
+    build: Callable[[], Select[Any]], prebuilt: Select[Any]
+) -> None:
+    rebuilt_time = timeit(lambda: build()._generate_cache_key(), number=ROUNDS)
+    prebuilt_time = timeit(lambda: prebuilt._generate_cache_key(), number=ROUNDS)
+
+    assert prebuilt_time * 5 < rebuilt_time
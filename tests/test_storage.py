@@ -0,0 +1,142 @@
+import asyncio
+import hmac
+import time
+from io import BytesIO
+from pathlib import Path
+from threading import Event, Lock
+
+import pytest
+from anyio.from_thread import BlockingPortal
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.config import settings
+from src.files import router as files_router
+from src.utils.aws.s3 import AsyncS3Client
+from src.utils.local_storage import LocalStorage
+from src.utils.metrics import metrics
+
+
+def test_transfers_run_on_bounded_pool(
+    portal: BlockingPortal, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    storage = AsyncS3Client("test_s3", workers=1)
+    started, release = Event(), Event()
+    deleted: list[str] = []
+
+    def delete(key: str) -> None:
+        started.set()
+        release.wait(5)
+        deleted.append(key)
+
+    monkeypatch.setattr(storage.sync, "delete_key", delete)
+
+    async def _transfers() -> dict[str, float | dict[str, float]]:
+        first = asyncio.ensure_future(storage.delete("documents/a.pdf"))
+        second = asyncio.ensure_future(storage.delete("documents/b.pdf"))
+        third = asyncio.ensure_future(storage.delete("documents/c.pdf"))
+        await asyncio.to_thread(started.wait, 5)
+        busy = metrics.snapshot()
+
+        # A transfer cancelled while still queued never runs
+        third.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, second)
+        await asyncio.gather(third, return_exceptions=True)
+        return busy
+
+    busy = portal.call(_transfers)
+
+    assert busy["test_s3_transfers_in_flight"] == 1
+    assert busy["test_s3_transfer_queue_depth"] == 2
+    assert deleted == ["documents/a.pdf", "documents/b.pdf"]
+
+
+def test_delete_many_bounds_its_batches(
+    portal: BlockingPortal, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "AWS_DELETE_CONCURRENCY", 2)
+    storage = AsyncS3Client("test_s3_delete", workers=8)
+    lock = Lock()
+    in_flight = [0]
+    peak = [0]
+    batches: list[int] = []
+
+    def delete_batch(keys: list[str]) -> None:
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+            batches.append(len(keys))
+
+    monkeypatch.setattr(storage.sync, "_delete_batch", delete_batch)
+
+    portal.call(storage.delete_many, [f"documents/{i}" for i in range(4500)])
+
+    assert sorted(batches) == [500, 1000, 1000, 1000, 1000]
+    assert peak[0] == 2
+    assert metrics.snapshot()["test_s3_transfers_in_flight"] == 0
+    assert metrics.snapshot()["test_s3_transfer_queue_depth"] == 0
+
+
+def test_local_storage(portal: BlockingPortal, tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path, "http://testserver", workers=2)
+
+    async def _store() -> list[bytes]:
+        await storage.put_file(BytesIO(b"logo content"), "uploads/x", "image/png")
+        await storage.copy("uploads/x", "logos/abc")
+        await storage.delete("uploads/x")
+        return [chunk async for chunk in storage.stream("logos/abc", 5, 11)]
+
+    chunks = portal.call(_store)
+    info = portal.call(storage.head, "logos/abc")
+
+    assert b"".join(chunks) == b"content"
+    assert info is not None and info.content_type == "image/png"
+    # Nothing resizes logos locally, the original stands in
+    assert (tmp_path / "resized_logos/abc").read_bytes() == b"logo content"
+    assert portal.call(storage.head, "uploads/x") is None
+    portal.call(storage.delete, "logos/abc")
+    assert not (tmp_path / "resized_logos/abc").exists()
+
+
+def test_local_signed_urls(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    storage = LocalStorage(tmp_path, "http://testserver", workers=2)
+    monkeypatch.setattr(files_router, "storage", storage)
+    app = FastAPI()
+    app.include_router(files_router.router)
+    client = TestClient(app)
+
+    post = storage.presign_post("uploads/x", "application/pdf", 12)
+    uploaded = client.post(
+        post["url"],
+        data=post["fields"],
+        files={"file": ("x.pdf", b"file content", "application/pdf")},
+    )
+    url = storage.presign("uploads/x")
+    downloaded = client.get(url)
+    tampered = client.get(url.replace("uploads/x", "uploads/y"))
+
+    assert uploaded.status_code == 204
+    assert downloaded.content == b"file content"
+    assert downloaded.headers["content-type"] == "application/pdf"
+    assert tampered.status_code == 403
+
+
+def test_key_from_url_under_base_path(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path, "http://testserver/api/", workers=2)
+
+    key = storage.key_from_url(storage.object_url("documents/abc"))
+    moved = storage.key_from_url("http://oldserver/documents/abc")
+
+    assert key == moved == "documents/abc"
+
+
+def test_local_urls_not_signed_with_secret_key(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path, "http://testserver", workers=2)
+    jwt_signature = hmac.new(settings.SECRET_KEY.encode(), b"x", "sha256")
+
+    assert storage.sign("x") != jwt_signature.hexdigest()
@@ -0,0 +1,34 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from src.users.schemas import User
+from tests.query_counter import max_queries
+
+
+@max_queries(1)
+def test_create_user(client: TestClient) -> None:
+    data = {"username": "new_user", "password": "12345678"}
+
+    res = client.post("/auth", json=data)
+
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()["username"] == data["username"]
+
+
+@max_queries(1)
+def test_login(client: TestClient, test_user: User) -> None:
+    data = {"username": test_user.username, "password": "12345678"}
+
+    res = client.post("/login", data=data)
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()["type"] == "bearer"
+
+
+@max_queries(1)
+def test_login_with_wrong_password(client: TestClient, test_user: User) -> None:
+    data = {"username": test_user.username, "password": "wrong_password"}
+
+    res = client.post("/login", data=data)
+
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED